@@ -0,0 +1,351 @@
+"""Asyncio interface to the Claude API."""
+import asyncio
+import concurrent.futures
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar, Union
+
+from claude import claude_client
+from claude import constants
+from claude.custom_types import JsonType, HeaderType, AttachmentType
+
+T = TypeVar("T")
+
+# Marks the end of a stream that is being pulled from a worker thread.
+_STREAM_END = object()
+
+# Most items of a stream that a worker thread reads ahead of the caller.
+STREAM_READ_AHEAD = 64
+# How often a worker thread that is waiting for room in the read ahead queue checks whether
+# the caller is gone, in seconds.
+_STREAM_POLL_SECONDS = 0.1
+
+
+class _StreamError:
+    """Carries an error raised while reading a stream on a worker thread to the event loop."""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class AsyncClaudeClient:
+    """Async counterpart to ClaudeClient, with the same methods as coroutines.
+
+    Every call runs the blocking ClaudeClient method on a worker thread, so independent calls
+    can be awaited concurrently (e.g. with asyncio.gather) while sharing the pooled connections
+    of a single underlying client. |max_workers| bounds how many requests are in flight at once.
+    """
+
+    def __init__(
+        self,
+        session_key: str,
+        base_url: str = constants.BASE_URL,
+        user_agent: str = constants.USER_AGENT,
+        spoofed_headers: Optional[HeaderType] = None,
+        logging_level: int = claude_client.LOG_LEVEL_WARNING,
+        rate_limit: Optional[Tuple[int, float]] = None,
+        max_retries: int = constants.MAX_RETRIES,
+        max_workers: int = 16,
+    ):
+        self._client = claude_client.ClaudeClient(
+            session_key,
+            base_url=base_url,
+            user_agent=user_agent,
+            spoofed_headers=spoofed_headers,
+            logging_level=logging_level,
+            rate_limit=rate_limit,
+            max_retries=max_retries,
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def __aenter__(self) -> "AsyncClaudeClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Waits for in flight calls to finish and closes the pooled connections."""
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._executor.shutdown, wait=True)
+        )
+        self._client.close()
+
+    async def send_message(
+        self,
+        organization_uuid: str,
+        conversation_uuid: str,
+        message: str,
+        attachments: List[AttachmentType],
+        timezone: constants.Timezone,
+        model: constants.Model,
+        stream: bool = False,
+    ) -> Union[AsyncIterator[JsonType], Optional[JsonType]]:
+        """Send a message to an organization/conversation. Stream mode will return an async iterator
+        of the streamed responses, while unstreamed mode will return the last response that was received.
+        """
+        if stream:
+            return self._iterate_in_executor(
+                self._client.send_message(
+                    organization_uuid,
+                    conversation_uuid,
+                    message,
+                    attachments,
+                    timezone,
+                    model,
+                    stream=True,
+                )
+            )
+        return await self._run(
+            self._client.send_message,
+            organization_uuid,
+            conversation_uuid,
+            message,
+            attachments,
+            timezone,
+            model,
+            stream=False,
+        )
+
+    async def send_messages_bulk(
+        self,
+        organization_uuid: str,
+        messages: List[Tuple[str, str]],
+        timezone: constants.Timezone,
+        model: constants.Model,
+    ) -> List[Optional[JsonType]]:
+        """Sends every (conversation_uuid, message) pair in |messages| concurrently. Returns the
+        unstreamed responses in the same order as |messages|.
+        """
+        return await asyncio.gather(
+            *[
+                self.send_message(
+                    organization_uuid, conversation_uuid, message, [], timezone, model
+                )
+                for conversation_uuid, message in messages
+            ]
+        )
+
+    async def convert_file(
+        self, organization_uuid: str, file_path: str
+    ) -> Optional[AttachmentType]:
+        """Uploads a file to the claude API to convert it into an attatchment type."""
+        return await self._run(self._client.convert_file, organization_uuid, file_path)
+
+    async def create_conversation(
+        self, organization_uuid: str, new_conversation_uuid: str
+    ) -> Optional[JsonType]:
+        """Creates a conversation in the organization represented by |organization_uuid|,
+        with a new conversation id of |new_conversation_uuid|.
+        """
+        return await self._run(
+            self._client.create_conversation, organization_uuid, new_conversation_uuid
+        )
+
+    async def delete_conversation(
+        self, organization_uuid: str, conversation_uuid: str
+    ) -> bool:
+        """Removes a conversation |conversation_uuid| from the organization |organization_uuid|."""
+        return await self._run(
+            self._client.delete_conversation, organization_uuid, conversation_uuid
+        )
+
+    async def delete_all_conversations(self, organization_uuid: str) -> List[str]:
+        """Deletes all the conversations in the organization concurrently. Returns a list of
+        conversation uuids that the client failed to delete. In the case that all conversations
+        were deleted correctly, this should return an empty list.
+        """
+        conversations = await self.get_conversations_from_org(organization_uuid)
+        if conversations is None:
+            return []
+        conversation_uuids = [conversation["uuid"] for conversation in conversations]  # type: ignore
+        deleted = await asyncio.gather(
+            *[
+                self.delete_conversation(organization_uuid, conversation_uuid)
+                for conversation_uuid in conversation_uuids
+            ]
+        )
+        return [
+            conversation_uuid
+            for conversation_uuid, conversation_deleted in zip(conversation_uuids, deleted)
+            if not conversation_deleted
+        ]
+
+    async def generate_conversation_title(
+        self,
+        organization_uuid: str,
+        conversation_uuid: str,
+        message: str,
+        recent_conversation_names: List[str],
+    ) -> Optional[JsonType]:
+        """Generates a chat title for a given |conversation| in an |organization|."""
+        return await self._run(
+            self._client.generate_conversation_title,
+            organization_uuid,
+            conversation_uuid,
+            message,
+            recent_conversation_names,
+        )
+
+    async def rename_conversation_title(
+        self, organization_uuid: str, conversation_uuid: str, new_title: str
+    ) -> Optional[JsonType]:
+        """Renames a conversation title to |new_title|."""
+        return await self._run(
+            self._client.rename_conversation_title,
+            organization_uuid,
+            conversation_uuid,
+            new_title,
+        )
+
+    async def get_conversation_info(
+        self, organization_uuid: str, conversation_uuid: str
+    ) -> Optional[JsonType]:
+        """Gets full chat information from an organization and chat uuid."""
+        return await self._run(
+            self._client.get_conversation_info, organization_uuid, conversation_uuid
+        )
+
+    async def get_conversation_infos(
+        self, organization_uuid: str, conversation_uuids: List[str]
+    ) -> List[Optional[JsonType]]:
+        """Gets full chat information for every chat in |conversation_uuids| concurrently, in
+        the same order.
+        """
+        return await asyncio.gather(
+            *[
+                self.get_conversation_info(organization_uuid, conversation_uuid)
+                for conversation_uuid in conversation_uuids
+            ]
+        )
+
+    async def get_conversations_from_org(self, organization_uuid: str) -> Optional[JsonType]:
+        return await self._run(self._client.get_conversations_from_org, organization_uuid)
+
+    async def get_organization_by_uuid(self, organization_uuid: str) -> Optional[JsonType]:
+        """Gets an organization by its uuid."""
+        return await self._run(self._client.get_organization_by_uuid, organization_uuid)
+
+    async def get_organizations(self) -> Optional[JsonType]:
+        """Get organization data JSON."""
+        return await self._run(self._client.get_organizations)
+
+    async def get_default_organization_uuid(self) -> Optional[str]:
+        """Gets the uuid of the first organization the user is in."""
+        return await self._run(self._client.get_default_organization_uuid)
+
+    async def bootstrap(
+        self, organization_uuid: Optional[str] = None, max_concurrency: int = 8
+    ) -> Optional[Dict[str, JsonType]]:
+        """Fetches an organization, its conversations and the info of every conversation,
+        overlapping the requests where possible. If no |organization_uuid| is provided, the first
+        organization the user is in is used. At most |max_concurrency| conversation infos are
+        fetched at once.
+
+        Returns a json formatted like:
+        {
+            'organization': {organization: Json},
+            'conversations': {conversations in the organization: Json},
+            'conversation_infos': {conversation_uuid: conversation info Json}
+        }
+        """
+        if organization_uuid is None:
+            organizations = await self.get_organizations()
+            if not organizations:
+                return None
+            organization = organizations[0]  # type: ignore
+            organization_uuid = organization["uuid"]
+            conversations = await self.get_conversations_from_org(organization_uuid)
+        else:
+            # The organization and its conversations don't depend on each other.
+            organization, conversations = await asyncio.gather(
+                self.get_organization_by_uuid(organization_uuid),
+                self.get_conversations_from_org(organization_uuid),
+            )
+        if organization is None or conversations is None:
+            return None
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def get_conversation_info(conversation_uuid: str) -> Optional[JsonType]:
+            async with semaphore:
+                return await self.get_conversation_info(organization_uuid, conversation_uuid)  # type: ignore
+
+        conversation_uuids = [conversation["uuid"] for conversation in conversations]  # type: ignore
+        conversation_infos = await asyncio.gather(
+            *[get_conversation_info(conversation_uuid) for conversation_uuid in conversation_uuids]
+        )
+        return {
+            "organization": organization,
+            "conversations": conversations,
+            "conversation_infos": dict(zip(conversation_uuids, conversation_infos)),
+        }
+
+    async def _run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Runs a blocking client call on the worker threads."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def _iterate_in_executor(self, iterator: Iterator[T]) -> AsyncIterator[T]:
+        """Pulls items from a blocking |iterator| on a worker thread. The worker keeps reading
+        ahead, by up to STREAM_READ_AHEAD items, while the caller handles the items it already
+        got, so the network reads overlap with whatever the caller does with each item.
+        """
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[object]" = asyncio.Queue(maxsize=STREAM_READ_AHEAD)
+        stopped = threading.Event()
+
+        def put(item: object) -> bool:
+            """Hands |item| to the caller, waiting while the queue is full. Returns False if
+            the caller stopped reading or the event loop is gone.
+            """
+            put_item = queue.put(item)
+            try:
+                future = asyncio.run_coroutine_threadsafe(put_item, loop)
+            except RuntimeError:
+                # The event loop was closed while the stream was being read.
+                put_item.close()
+                return False
+            while True:
+                try:
+                    future.result(timeout=_STREAM_POLL_SECONDS)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    if stopped.is_set() or loop.is_closed():
+                        try:
+                            future.cancel()
+                        except RuntimeError:
+                            pass
+                        return False
+                except concurrent.futures.CancelledError:
+                    # The event loop cancelled the put while shutting down.
+                    return False
+
+        def produce() -> None:
+            try:
+                for item in iterator:
+                    if stopped.is_set() or not put(item):
+                        break
+                else:
+                    put(_STREAM_END)
+            except Exception as e:
+                put(_StreamError(e))
+            finally:
+                # Closing the iterator releases its connection if it was stopped early.
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+
+        loop.run_in_executor(self._executor, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, _StreamError):
+                    raise item.error
+                yield item  # type: ignore
+        finally:
+            stopped.set()
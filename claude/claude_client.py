@@ -1,20 +1,48 @@
 """Helper class to access Claude APIs via raw json."""
-import json
-import pathlib
-from typing import List, Optional, Iterator, Union
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import hashlib
+import io
+import logging
+import os
+import random
+import re
+import stat
+import time
+import types
+from typing import Callable, Dict, List, Optional, Iterator, Tuple, Union
 
 
 from claude import constants
 from claude import custom_requests
 from claude import helpers
+from claude import rate_limiter
 from claude.custom_types import JsonType, HeaderType, AttachmentType
 from claude import logger
 
+# Stop reason of the chunk that ends a streamed message.
+_STOP_SEQUENCE = b'stop_sequence'
+
+# Patterns that pull the fields needed to aggregate a message out of the raw JSON
+# of a streamed chunk, without parsing the whole chunk.
+_COMPLETION_PATTERN = re.compile(rb'"completion"\s*:\s*("(?:[^"\\]|\\.)*")')
+_STOP_REASON_PATTERN = re.compile(rb'"stop_reason"\s*:\s*"([^"]*)"')
+
+# Statuses of responses that are worth retrying: rate limits and transient server errors.
+_RETRY_STATUS_CODES = frozenset((429, 500, 502, 503, 504))
+# Request methods that can be retried after a server error without doing anything twice.
+_IDEMPOTENT_REQUEST_METHODS = frozenset((custom_requests.get, custom_requests.delete))
+
+# The first organization of every (base url, session key) a client was created with. Shared
+# between clients, so that new clients and wrappers for the same user don't have to refetch it.
+# Keyed by a hash of the session key, so that the process doesn't hold on to raw keys.
+_DEFAULT_ORGANIZATION_UUIDS: Dict[Tuple[str, str], str] = {}
+
 # Logging levels.
-LOG_LEVEL_DEBUG = logger.logger.DEBUG
-LOG_LEVEL_INFO = logger.logger.INFO
-LOG_LEVEL_WARNING = logger.logger.WARNING
-LOG_LEVEL_ERROR = logger.logger.ERROR
+LOG_LEVEL_DEBUG = logging.DEBUG
+LOG_LEVEL_INFO = logging.INFO
+LOG_LEVEL_WARNING = logging.WARNING
+LOG_LEVEL_ERROR = logging.ERROR
 
 class ClaudeClient:
     """Acts as a lower level interface to the Claude API. Returns raw JSON
@@ -25,6 +53,32 @@ class ClaudeClient:
     implementations and pass in the client for the most flexibility.
     """
 
+    # Clients are plain holders of per-session state, so give them a fixed layout
+    # instead of a per-instance __dict__.
+    __slots__ = (
+        "_session_key",
+        "_base_url",
+        "_user_agent",
+        "_spoofed_headers",
+        "_default_header",
+        "_default_json_header",
+        "_sse_header",
+        "_organizations_url",
+        "_conversations_url",
+        "_start_conversation_url",
+        "_delete_conversation_url",
+        "_conversation_info_url",
+        "_send_message_url",
+        "_generate_title_url",
+        "_rename_conversation_url",
+        "_convert_document_url",
+        "_organization_cache",
+        "_default_organization_key",
+        "_rate_limiter",
+        "_max_retries",
+        "_session",
+    )
+
     def __init__(
         self,
         session_key: str,
@@ -32,7 +86,22 @@ class ClaudeClient:
         user_agent: str = constants.USER_AGENT,
         spoofed_headers: Optional[HeaderType] = None,
         logging_level: int = LOG_LEVEL_WARNING,
+        rate_limit: Optional[Tuple[int, float]] = None,
+        max_retries: int = constants.MAX_RETRIES,
     ):
+        """|rate_limit| optionally caps requests to (max requests, per period in seconds),
+        e.g. (10, 1.0) for at most 10 requests a second. Requests that are rate limited, and
+        GETs and DELETEs that hit a transient server error, are retried up to |max_retries| times
+        with exponential back off.
+        """
+        # Explicit checks rather than asserts, so that bad arguments fail here even under -O
+        # instead of as failed requests later on.
+        if not session_key:
+            raise ValueError("A session key is required.")
+        if not base_url.startswith(("https://", "http://")):
+            raise ValueError(f"Base url {base_url} needs to be an http(s) url.")
+        if max_retries < 0:
+            raise ValueError("max_retries can't be negative.")
         self._session_key = session_key
         self._base_url = base_url
         self._user_agent = user_agent
@@ -40,8 +109,66 @@ class ClaudeClient:
             self._spoofed_headers = constants.HEADERS
         else:
             self._spoofed_headers = spoofed_headers
+        # The default headers never change after construction, so build them once here
+        # instead of on every request. They are shared across calls, so only read only views
+        # of them are kept.
+        default_header = {
+            **self._spoofed_headers,
+            "user-agent": self._user_agent,
+            "cookie": f"sessionKey={self._session_key}",
+            # Responses are JSON or text, so have them gzipped. custom_requests transparently
+            # decompresses them.
+            "accept-encoding": "gzip",
+        }
+        default_json_header = {
+            **default_header,
+            "content-type": "application/json",
+        }
+        # Streaming a message needs the server to respond with an event stream.
+        accept = default_json_header.get("accept")
+        sse_header = {
+            **default_json_header,
+            "accept": f"{accept},text/event-stream" if accept else "text/event-stream",
+        }
+        self._default_header = types.MappingProxyType(default_header)
+        self._default_json_header = types.MappingProxyType(default_json_header)
+        self._sse_header = types.MappingProxyType(sse_header)
+        # Fully formed request urls. Templated endpoints are stored as bound `str.format`
+        # methods over the base url, so call sites only fill in the uuids.
+        self._organizations_url = self._get_api_url(constants.GET_ORGANIZATIONS_API_ENDPOINT)
+        self._conversations_url = self._get_api_url(constants.GET_CONVERSATIONS_API_ENDPOINT).format
+        self._start_conversation_url = self._get_api_url(constants.START_CONVERSATION_API_ENDPOINT).format
+        self._delete_conversation_url = self._get_api_url(constants.DELETE_CONVERSATION_API_ENDPOINT).format
+        self._conversation_info_url = self._get_api_url(constants.GET_CONVERSATION_INFO_API_ENDPOINT).format
+        self._send_message_url = self._get_api_url(constants.SEND_MESSAGE_API_ENDPOINT).format
+        self._generate_title_url = self._get_api_url(constants.GENERATE_CHAT_TITLE_API_ENDPOINT)
+        self._rename_conversation_url = self._get_api_url(constants.RENAME_CONVERSATION_API_ENDPOINT)
+        self._convert_document_url = self._get_api_url(constants.CONVERT_DOCUMENT_API_ENDPOINT)
+        # (fetch time, organizations, organizations by uuid) from the last get_organizations() call.
+        self._organization_cache: Optional[Tuple[float, JsonType, Dict[str, JsonType]]] = None
+        self._default_organization_key = (
+            self._base_url,
+            hashlib.sha256(self._session_key.encode()).hexdigest(),
+        )
+        self._rate_limiter = None
+        if rate_limit is not None:
+            self._rate_limiter = rate_limiter.RateLimiter(*rate_limit)
+        self._max_retries = max_retries
+        # Every request goes through this session so that the TCP + TLS connection to the
+        # API host is reused across calls.
+        self._session = custom_requests.Session()
+
+        logger.logger.setLevel(logging_level)
+
+    def __enter__(self) -> "ClaudeClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
-        logger.logger.getLogger().setLevel(logging_level)
+    def close(self) -> None:
+        """Closes the pooled connections held by the client."""
+        self._session.close()
 
     def send_message(
         self,
@@ -66,34 +193,59 @@ class ClaudeClient:
                 model,
             )
         else:
-            STOP_SEQUENCE = 'stop_sequence'
             aggregated_completion = []
-            final_response = None
-            for elem in self._send_message(
+            # Bind the append once, since it runs for every streamed chunk.
+            append_completion = aggregated_completion.append
+            final_chunk = None
+            # Only the `completion` and `stop_reason` fields of intermediate chunks are needed,
+            # so pull those out with a regex and only fully parse the last chunk.
+            chunks = self._send_message_raw(
                 organization_uuid,
                 conversation_uuid,
                 message,
                 attachments,
                 timezone,
                 model,
-            ):
-                final_response = elem
-                # Make sure that the completion text is in the json chunks.
-                if 'completion' in elem:
-                    # The new API sends each chunk of text in the `completion` field, and
-                    # it has to be stiched together at the end to form the full response.
-                    aggregated_completion.append(elem['completion'])
-                # Return early if we hit the stop sequence, though this may not be correct
-                # 100% of the time.
-                if 'stop_reason' in elem and elem['stop_reason'] == STOP_SEQUENCE:
+            )
+            for chunk in chunks:
+                final_chunk = chunk
+                # The new API sends each chunk of text in the `completion` field, and
+                # it has to be stiched together at the end to form the full response.
+                completion_match = _COMPLETION_PATTERN.search(chunk)
+                if completion_match is not None:
+                    completion = completion_match.group(1)
+                    try:
+                        if b"\\" in completion:
+                            # Let the JSON parser deal with escape sequences. The matched string
+                            # literal is valid JSON on its own, and is handed over as bytes.
+                            append_completion(helpers.json_loads(completion))
+                        else:
+                            append_completion(completion[1:-1].decode("utf-8"))
+                    except ValueError:
+                        # Same as in stream mode, a malformed chunk is skipped.
+                        logger.logger.warning("Skipping undecodable streamed chunk: %s", chunk)
+                        continue
+                # The chunk with the stop sequence ends the message. Whatever the server sends
+                # after it isn't part of the completion, but it's still read (and thrown away)
+                # so that the stream ends cleanly and its connection goes back to the pool
+                # instead of being dropped.
+                stop_reason_match = _STOP_REASON_PATTERN.search(chunk)
+                if stop_reason_match is not None and stop_reason_match.group(1) == _STOP_SEQUENCE:
+                    for _ in chunks:
+                        pass
                     break
             # If we never set the final response, that means that we had no response.
             # In this case, return None.
-            if final_response is None:
+            if final_chunk is None:
                 logger.logger.warning("Response from sending message is None.")
                 return None
             # Return the response as if it were the full json response, but replace
             # the `completion` section with the aggregated completion.
+            try:
+                final_response = helpers.json_loads(final_chunk)
+            except ValueError:
+                logger.logger.warning("Last streamed chunk is not valid json: %s", final_chunk)
+                return None
             final_response['completion'] = ''.join(aggregated_completion)
             return final_response
 
@@ -105,20 +257,24 @@ class ClaudeClient:
 
         The actual schema of the return json can be found under custom_types.py
         """
-        pathlib_file = pathlib.Path(file_path)
-        if not pathlib_file.is_file():
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            file_stat = None
+        if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
             logger.logger.warning("Path %s does not exist.", file_path)
             return None
         # If the file is text based, directly read the file contents and return an attachment for it.
-        is_text_based, contents = helpers.is_file_text_based(file_path)
+        is_text_based, raw_contents, contents = helpers.is_file_text_based(file_path)
         if is_text_based:
             logger.logger.info("Text based file detected, not converting.")
             if contents is None:
                 logger.logger.warning("Contents of file in %s is not unicode decodable.", file_path)
                 return None
+            file_name = os.path.basename(file_path)
             return { # type: ignore
-                "file_name": pathlib_file.name,
-                "file_type": pathlib_file.suffix,
+                "file_name": file_name,
+                "file_type": os.path.splitext(file_name)[1],
                 "file_size": len(contents),
                 "extracted_content": contents,
             }
@@ -126,21 +282,39 @@ class ClaudeClient:
         # If the file is not text based, upload the file to the claude API, and then receive
         # the attachment in response.
         logger.logger.info("Uploading non-text based file %s to API endpoint.", file_path)
-        form_data = {
-            "orgUuid": organization_uuid,
-            "file": (file_path, open(file_path, "rb")),
-        }
-        header = {}
-        header.update(self._get_default_header())
-        response = custom_requests.post_form_data(
-            self._get_api_url(constants.CONVERT_DOCUMENT_API_ENDPOINT), headers=header, files=form_data
-        )
+        header = self._default_header
+        # Small files are uploaded from the bytes we already read, if that was all of the file.
+        # Otherwise they are streamed from disk so that we don't hold on to them, and closed
+        # even if the upload fails.
+        if (
+            len(raw_contents) == file_stat.st_size
+            and len(raw_contents) <= constants.IN_MEMORY_UPLOAD_MAX_BYTES
+        ):
+            file_context = io.BytesIO(raw_contents)
+        else:
+            file_context = open(file_path, "rb")
+        del raw_contents
+        with file_context as file_open:
+            form_data = {
+                "orgUuid": organization_uuid,
+                "file": (file_path, file_open),
+            }
+            # The upload consumes the file, so it can't be retried.
+            response = self._request(
+                custom_requests.post_form_data,
+                self._convert_document_url,
+                headers=header,
+                files=form_data,
+                max_retries=0,
+            )
         if not response.ok:
-            logger.logger.warning("Failed response object: %s", str(response))
+            logger.logger.warning("Failed response object: %s", response)
             return None
 
-        logger.logger.info("Response json object: %s", str(response.json()))
-        return response.json() # type: ignore
+        body = response.json()
+        if logger.logger.isEnabledFor(LOG_LEVEL_INFO):
+            logger.logger.info("Response json object: %s", body)
+        return body # type: ignore
 
     def create_conversation(
         self, organization_uuid: str, new_conversation_uuid: str
@@ -148,42 +322,37 @@ class ClaudeClient:
         """Creates a conversation in the organization represented by |organization_uuid|,
         with a new conversation id of |new_conversation_uuid|.
         """
-        header = {}
-        header.update(self._get_default_header())
-        header.update({"content-type": "application/json"})
-        response = custom_requests.post(
-            self._get_api_url(
-                constants.START_CONVERSATION_API_ENDPOINT.format(
-                    organization_uuid=organization_uuid
-                )
-            ),
+        header = self._default_json_header
+        response = self._request(
+            custom_requests.post,
+            self._start_conversation_url(organization_uuid=organization_uuid),
             headers=header,
             request_body={"name": "", "uuid": new_conversation_uuid},
         )
         if not response.ok:
-            logger.logger.warning("Failed response object: %s", str(response))
+            logger.logger.warning("Failed response object: %s", response)
             return None
 
-        logger.logger.info("Response json object: %s", str(response.json()))
-        return response.json()
+        body = response.json()
+        if logger.logger.isEnabledFor(LOG_LEVEL_INFO):
+            logger.logger.info("Response json object: %s", body)
+        return body
 
     def delete_conversation(
         self, organization_uuid: str, conversation_uuid: str
     ) -> bool:
         """Removes a conversation |conversation_uuid| from the organization |organization_uuid|."""
-        header = {}
-        header.update(self._get_default_header())
-        response = custom_requests.delete(
-            self._get_api_url(
-                constants.DELETE_CONVERSATION_API_ENDPOINT.format(
-                    organization_uuid=organization_uuid,
-                    conversation_uuid=conversation_uuid,
-                )
+        header = self._default_header
+        response = self._request(
+            custom_requests.delete,
+            self._delete_conversation_url(
+                organization_uuid=organization_uuid,
+                conversation_uuid=conversation_uuid,
             ),
             headers=header,
         )
 
-        logger.logger.info("Response json object: %s", str(response))
+        logger.logger.info("Response json object: %s", response)
         return response.ok
 
     def generate_conversation_title(
@@ -196,11 +365,10 @@ class ClaudeClient:
         """Generates a chat title for a given |conversation| in an |organization| when the current
         message is |message|, and the last few conversation names were |recent_conversation_names|.
         """
-        header = {}
-        header.update(self._get_default_header())
-        header.update({"content-type": "application/json"})
-        response = custom_requests.post(
-            self._get_api_url(constants.GENERATE_CHAT_TITLE_API_ENDPOINT),
+        header = self._default_json_header
+        response = self._request(
+            custom_requests.post,
+            self._generate_title_url,
             headers=header,
             request_body={
                 "organization_uuid": organization_uuid,
@@ -210,11 +378,13 @@ class ClaudeClient:
             },
         )
         if not response.ok:
-            logger.logger.warning("Failed response object: %s", str(response))
+            logger.logger.warning("Failed response object: %s", response)
             return None
 
-        logger.logger.info("Response json object: %s", str(response.json()))
-        return response.json()
+        body = response.json()
+        if logger.logger.isEnabledFor(LOG_LEVEL_INFO):
+            logger.logger.info("Response json object: %s", body)
+        return body
 
     def rename_conversation_title(
         self, organization_uuid: str, conversation_uuid: str, new_title: str
@@ -225,87 +395,130 @@ class ClaudeClient:
             "conversation_uuid": conversation_uuid,
             "title": new_title,
         }
-        header = {}
-        header.update(self._get_default_header())
-        header.update({"content-type": "application/json"})
-        response = custom_requests.post(
-            self._get_api_url(constants.RENAME_CONVERSATION_API_ENDPOINT),
+        header = self._default_json_header
+        response = self._request(
+            custom_requests.post,
+            self._rename_conversation_url,
             headers=header,
             request_body=request_body,
         )
         if not response.ok:
-            logger.logger.warning("Failed response object: %s", str(response))
+            logger.logger.warning("Failed response object: %s", response)
             return None
 
-        logger.logger.info("Response json object: %s", str(response.json()))
-        return response.json()
+        body = response.json()
+        if logger.logger.isEnabledFor(LOG_LEVEL_INFO):
+            logger.logger.info("Response json object: %s", body)
+        return body
 
     def get_conversation_info(
         self, organization_uuid: str, conversation_uuid: str
     ) -> Optional[JsonType]:
         """Gets full chat information from an organization and chat uuid."""
-        header = {}
-        header.update(self._get_default_header())
-        header.update({"content-type": "application/json"})
-        response = custom_requests.get(
-            self._get_api_url(
-                constants.GET_CONVERSATION_INFO_API_ENDPOINT.format(
-                    organization_uuid=organization_uuid,
-                    conversation_uuid=conversation_uuid,
-                )
+        header = self._default_json_header
+        response = self._request(
+            custom_requests.get,
+            self._conversation_info_url(
+                organization_uuid=organization_uuid,
+                conversation_uuid=conversation_uuid,
             ),
             headers=header,
         )
         if not response.ok:
-            logger.logger.warning("Failed response object: %s", str(response))
+            logger.logger.warning("Failed response object: %s", response)
             return None
 
-        logger.logger.info("Response json object: %s", str(response.json()))
-        return response.json()
+        body = response.json()
+        if logger.logger.isEnabledFor(LOG_LEVEL_INFO):
+            logger.logger.info("Response json object: %s", body)
+        return body
 
-    def get_conversations_from_org(self, organization_uuid: str) -> Optional[JsonType]:
-        header = {}
-        header.update(self._get_default_header())
-        header.update({"content-type": "application/json"})
-        response = custom_requests.get(
-            self._get_api_url(
-                constants.GET_CONVERSATIONS_API_ENDPOINT.format(
-                    organization_uuid=organization_uuid
+    def get_conversation_infos(
+        self, organization_uuid: str, conversation_uuids: List[str], max_workers: int = 8
+    ) -> List[Optional[JsonType]]:
+        """Gets full chat information for every chat in |conversation_uuids|, in the same order.
+        Up to |max_workers| requests are sent at once over the client's pooled connections; pass
+        the client a rate_limit if that is too many for the API.
+        """
+        if not conversation_uuids:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(conversation_uuids))) as executor:
+            return list(
+                executor.map(
+                    functools.partial(self.get_conversation_info, organization_uuid),
+                    conversation_uuids,
                 )
-            ),
+            )
+
+    def get_conversations_from_org(self, organization_uuid: str) -> Optional[JsonType]:
+        header = self._default_json_header
+        response = self._request(
+            custom_requests.get,
+            self._conversations_url(organization_uuid=organization_uuid),
             headers=header,
         )
         if not response.ok:
-            logger.logger.warning("Failed response object: %s", str(response))
+            logger.logger.warning("Failed response object: %s", response)
             return None
 
-        logger.logger.info("Response json object: %s", str(response.json()))
-        return response.json()
+        body = response.json()
+        if logger.logger.isEnabledFor(LOG_LEVEL_INFO):
+            logger.logger.info("Response json object: %s", body)
+        return body
 
     def get_organization_by_uuid(self, organization_uuid: str) -> Optional[JsonType]:
         """Gets an organization by its uuid."""
-        organization_data = self.get_organizations()
-        if organization_data is None:
+        if self.get_organizations() is None:
             return None
-        for organization in organization_data:  # type: ignore
-            if organization["uuid"] == organization_uuid:
-                return organization
-        return None
+        return self._organization_cache[2].get(organization_uuid)  # type: ignore
 
     def get_organizations(self) -> Optional[JsonType]:
-        """Get organization data JSON."""
-        header = {}
-        header.update(self._get_default_header())
-        header.update({"content-type": "application/json"})
-        response = custom_requests.get(
-            self._get_api_url(constants.GET_ORGANIZATIONS_API_ENDPOINT), headers=header
+        """Get organization data JSON. The result is cached for ORGANIZATION_CACHE_TTL_SECONDS,
+        see invalidate_org_cache() to force a refetch.
+        """
+        if self._organization_cache is not None:
+            cached_at, organizations, _ = self._organization_cache
+            if time.monotonic() - cached_at < constants.ORGANIZATION_CACHE_TTL_SECONDS:
+                return organizations
+
+        header = self._default_json_header
+        response = self._request(
+            custom_requests.get,
+            self._organizations_url,
+            headers=header,
         )
         if not response.ok:
-            logger.logger.warning("Failed response object: %s", str(response))
+            logger.logger.warning("Failed response object: %s", response)
             return None
 
-        logger.logger.info("Response json object: %s", str(response.json()))
-        return response.json()
+        organizations = response.json()
+        if logger.logger.isEnabledFor(LOG_LEVEL_INFO):
+            logger.logger.info("Response json object: %s", organizations)
+        self._organization_cache = (
+            time.monotonic(),
+            organizations,
+            {organization["uuid"]: organization for organization in organizations},  # type: ignore
+        )
+        return organizations
+
+    def get_default_organization_uuid(self) -> Optional[str]:
+        """Gets the uuid of the first organization the user is in. This is remembered across
+        every client with the same session key, until the session is rejected.
+        """
+        organization_uuid = _DEFAULT_ORGANIZATION_UUIDS.get(self._default_organization_key)
+        if organization_uuid is not None:
+            return organization_uuid
+        organizations = self.get_organizations()
+        if not organizations:
+            return None
+        organization_uuid = organizations[0]["uuid"]  # type: ignore
+        _DEFAULT_ORGANIZATION_UUIDS[self._default_organization_key] = organization_uuid  # type: ignore
+        return organization_uuid  # type: ignore
+
+    def invalidate_org_cache(self) -> None:
+        """Drops the cached organizations, so the next lookup refetches them."""
+        self._organization_cache = None
+        _DEFAULT_ORGANIZATION_UUIDS.pop(self._default_organization_key, None)
 
     def _send_message(
         self,
@@ -319,6 +532,32 @@ class ClaudeClient:
         """Sends a message to the given organization/conversation. Returns a generator that contains the streamed
         response output.
         """
+        for streamed_data_chunk in self._send_message_raw(
+            organization_uuid,
+            conversation_uuid,
+            message,
+            attachments,
+            timezone,
+            model,
+        ):
+            try:
+                parsed_chunk = helpers.json_loads(streamed_data_chunk)
+            except ValueError:
+                # A single malformed chunk shouldn't end the whole stream.
+                logger.logger.warning("Skipping undecodable streamed chunk: %s", streamed_data_chunk)
+                continue
+            yield parsed_chunk
+
+    def _send_message_raw(
+        self,
+        organization_uuid: str,
+        conversation_uuid: str,
+        message: str,
+        attachments: List,
+        timezone: constants.Timezone,
+        model: constants.Model,
+    ) -> Iterator[bytes]:
+        """Same as _send_message(), but yields the unparsed JSON of each streamed chunk."""
         request_body = {
             "attachments": attachments,
             "files": [],
@@ -326,38 +565,101 @@ class ClaudeClient:
             "timezone": timezone,
             "prompt": message,
         }
-        header = {}
-        header.update(self._get_default_header())
-        header.update({"content-type": "application/json"})
-        if header["accept"]:
-            header["accept"] += ",text/event-stream,text/event-stream"
-        else:
-            header["accept"] = "text/event-stream,text/event-stream"
-        
-        endpoint = self._create_conversation_endpoint(conversation_uuid=conversation_uuid, organization_uuid=organization_uuid)
-        
-        for streamed_data_chunk in custom_requests.sse(
-            self._get_api_url(endpoint),
-            headers=header,
-            request_body=request_body,
-        ):
-            yield json.loads(streamed_data_chunk)
-    
-    def _create_conversation_endpoint(
+        url = self._send_message_url(
+            organization_uuid=organization_uuid,
+            conversation_uuid=conversation_uuid,
+        )
+        # Like _request(), except that the events are streamed. Sending a message isn't
+        # idempotent, so only rate limited requests are retried.
+        attempt = 0
+        while True:
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+            response, events = custom_requests.open_sse(
+                url,
+                headers=self._sse_header,
+                request_body=request_body,
+                session=self._session,
+            )
+            delay = self._get_retry_delay(response, attempt, self._max_retries, False)
+            if delay is None:
+                if not response.ok:
+                    logger.logger.warning("Failed response object: %s", response)
+                yield from events
+                return
+            attempt += 1
+            time.sleep(delay)
+
+    def _request(
         self,
-        organization_uuid: str, 
-        conversation_uuid: str
-    ) -> str:
-        return f"/api/organizations/{organization_uuid}/chat_conversations/{conversation_uuid}/completion"
-    
+        request_method: Callable[..., custom_requests.Response],
+        *args,
+        max_retries: Optional[int] = None,
+        **kwargs,
+    ) -> custom_requests.Response:
+        """Sends a request with |request_method|, one of the custom_requests methods, over the
+        client's session once the rate limiter lets it through. Rate limited requests are
+        retried up to |max_retries| times, defaulting to the client's setting. Transient server
+        errors are only retried for GETs and DELETEs, since the server may have already acted
+        on anything else.
+        """
+        if max_retries is None:
+            max_retries = self._max_retries
+        retry_server_errors = request_method in _IDEMPOTENT_REQUEST_METHODS
+        attempt = 0
+        while True:
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+            response = request_method(*args, session=self._session, **kwargs)
+            delay = self._get_retry_delay(response, attempt, max_retries, retry_server_errors)
+            if delay is None:
+                return response
+            attempt += 1
+            time.sleep(delay)
+
+    def _get_retry_delay(
+        self,
+        response: custom_requests.Response,
+        attempt: int,
+        max_retries: int,
+        retry_server_errors: bool,
+    ) -> Optional[float]:
+        """Returns how many seconds to wait before sending a request again after it got
+        |response| on its |attempt|th retry, or None if it shouldn't be retried. Also applies
+        what the response says about the session, like rate limits and rejected session keys.
+        """
+        if response.status_code == 401:
+            # The session key was rejected, so anything cached for it may be stale.
+            self.invalidate_org_cache()
+        if response.status_code not in _RETRY_STATUS_CODES:
+            return None
+        if response.status_code != 429 and not retry_server_errors:
+            return None
+        retry_after = response.retry_after
+        if response.status_code == 429 and self._rate_limiter is not None:
+            # The configured limit was too generous, so send fewer requests from now on.
+            self._rate_limiter.slow_down()
+            if retry_after is not None:
+                # Respect the server's back off for every following request, too.
+                logger.logger.warning("Rate limited, holding requests for %s seconds.", retry_after)
+                self._rate_limiter.pause(retry_after)
+        if attempt >= max_retries:
+            return None
+        delay = max(
+            retry_after or 0.0,
+            constants.RETRY_BACKOFF_SECONDS * 2**attempt + random.random(),
+        )
+        if delay > constants.MAX_RETRY_WAIT_SECONDS:
+            return None
+        logger.logger.warning(
+            "Request failed with status %s, retrying in %.2f seconds (attempt %s of %s).",
+            response.status_code,
+            delay,
+            attempt + 1,
+            max_retries,
+        )
+        return delay
+
     def _get_api_url(self, endpoint: str):
         """Get the fully formed request URL."""
         return self._base_url + endpoint
-
-    def _get_default_header(self) -> HeaderType:
-        """Gets the default header with authentication, user agent, and other necessary header information."""
-        defualt_header = {}
-        defualt_header.update(self._spoofed_headers)
-        defualt_header.update({"user-agent": self._user_agent})
-        defualt_header.update({"cookie": f"sessionKey={self._session_key}"})
-        return defualt_header
@@ -1,4 +1,6 @@
-from typing import Optional, List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Tuple
+import time
 import uuid
 
 from claude import constants
@@ -21,11 +23,13 @@ class ClaudeWrapper:
         """
         self._client = client
         if organization_uuid is None:
-            self._organization_uuid = self._client.get_organizations()[0]['uuid']  # type: ignore
+            self._organization_uuid = self._client.get_default_organization_uuid()  # type: ignore
         else:
             self._organization_uuid = organization_uuid
 
         self._current_conversation = None
+        # (fetch time, names of the conversations in the organization), used to generate titles.
+        self._conversation_names_cache: Optional[Tuple[float, List[str]]] = None
 
     ####################################################################
     #                                                                  #
@@ -36,7 +40,7 @@ class ClaudeWrapper:
     def send_message(
         self,
         message: str,
-        attachments: List[AttachmentType] = [],
+        attachments: Optional[List[AttachmentType]] = None,
         conversation_uuid: Optional[str] = None,
         timezone: constants.Timezone = constants.Timezone.LA,
         model: constants.Model = constants.DEFAULT_MODEL,
@@ -50,6 +54,8 @@ class ClaudeWrapper:
         conversation_to_use = self._get_conversation_or_context(conversation_uuid)
         if conversation_to_use is None:
             return None
+        if attachments is None:
+            attachments = []
 
         return self._client.send_message(  # type: ignore
             self._organization_uuid,
@@ -71,7 +77,7 @@ class ClaudeWrapper:
         self,
         conversation_name: str,
         initial_message: str = "",
-        initial_attachments: List[AttachmentType] = [],
+        initial_attachments: Optional[List[AttachmentType]] = None,
         timezone: constants.Timezone = constants.Timezone.LA,
         model: constants.Model = constants.DEFAULT_MODEL,
     ) -> Optional[Dict[str, str]]:
@@ -99,6 +105,8 @@ class ClaudeWrapper:
 
         send_init_message_result = {}
         if initial_message:
+            if initial_attachments is None:
+                initial_attachments = []
             # Send the initial message to the newly created conversation.
             send_init_message_result = self._client.send_message(
                 self._organization_uuid,
@@ -113,11 +121,8 @@ class ClaudeWrapper:
                 return None
 
         # Generate a title for the new chat based on the names of previous chats.
-        recent_conversation_names = []
-        conversations = self._client.get_conversations_from_org(self._organization_uuid)
-        if conversations is not None:
-            recent_conversation_names.extend([convo["name"] for convo in conversations])  # type: ignore
-        else:
+        recent_conversation_names = self._get_recent_conversation_names()
+        if recent_conversation_names is None:
             # If we can't generate a title, just use the conversation name the user provided.
             recent_conversation_names = [conversation_name]
 
@@ -129,6 +134,9 @@ class ClaudeWrapper:
         )
         if convo_title is None:
             return None
+        # Keep the cached names up to date instead of refetching them for the next new chat.
+        if self._conversation_names_cache is not None:
+            self._conversation_names_cache[1].append(convo_title['title'])  # type: ignore
 
         return { # type: ignore
             'uuid': conversation_uuid,
@@ -161,17 +169,37 @@ class ClaudeWrapper:
             self._organization_uuid, conversation_to_use
         )
 
-    def delete_all_conversations(self) -> List[str]:
+    def get_conversation_infos(
+        self, conversation_uuids: List[str], max_workers: int = 16
+    ) -> Dict[str, Optional[JsonType]]:
+        """Gets the message history for every conversation in |conversation_uuids|, fetching up
+        to |max_workers| at once. Returns a dictionary from each conversation uuid to its
+        history, or None if it couldn't be fetched.
+        """
+        conversation_infos = self._client.get_conversation_infos(
+            self._organization_uuid, conversation_uuids, max_workers=max_workers
+        )
+        return dict(zip(conversation_uuids, conversation_infos))
+
+    def delete_all_conversations(self, max_workers: int = 16) -> List[str]:
         """Deletes all the conversations in the organization. Returns a list of conversations uuids
         that the client failed to delete. In the case that all conversations were deleted correctly,
         this should return an empty list.
+
+        Up to |max_workers| conversations are deleted at once. Pass a rate limit to the client
+        if that is too many requests for the API.
         """
-        failed_deletion = []
         conversations = self._client.get_conversations_from_org(self._organization_uuid)
-        for conversation in conversations:  # type: ignore
-            if not self.delete_conversation(conversation["uuid"]):
-                failed_deletion.append(conversation["uuid"])
-        return failed_deletion
+        conversation_uuids = [conversation["uuid"] for conversation in conversations]  # type: ignore
+        if not conversation_uuids:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(conversation_uuids))) as executor:
+            deleted = executor.map(self.delete_conversation, conversation_uuids)
+            return [
+                conversation_uuid
+                for conversation_uuid, conversation_deleted in zip(conversation_uuids, deleted)
+                if not conversation_deleted
+            ]
 
     def delete_conversation(self, conversation_uuid: Optional[str] = None) -> bool:
         """Deletes the provided conversation uuid or the current conversation context.
@@ -211,11 +239,12 @@ class ClaudeWrapper:
         """
         self._client = new_client
         if organization_uuid is None:
-            self._organization_uuid = self._client.get_organizations()[0]['uuid']  # type: ignore
+            self._organization_uuid = self._client.get_default_organization_uuid()  # type: ignore
         else:
             self._organization_uuid = organization_uuid
 
-        self._current_conversation = None        
+        self._current_conversation = None
+        self._conversation_names_cache = None
 
     ####################################################################
     #                                                                  #
@@ -223,15 +252,26 @@ class ClaudeWrapper:
     #                                                                  #
     ####################################################################
 
+    def _get_recent_conversation_names(self) -> Optional[List[str]]:
+        """Returns the names of the conversations in the organization, refetching them if the
+        cached names are older than CONVERSATION_NAMES_CACHE_TTL_SECONDS. Returns None if they
+        can't be fetched.
+        """
+        if self._conversation_names_cache is not None:
+            cached_at, names = self._conversation_names_cache
+            if time.monotonic() - cached_at < constants.CONVERSATION_NAMES_CACHE_TTL_SECONDS:
+                return names
+        conversations = self._client.get_conversations_from_org(self._organization_uuid)
+        if conversations is None:
+            return None
+        names = [convo["name"] for convo in conversations]  # type: ignore
+        self._conversation_names_cache = (time.monotonic(), names)
+        return names
+
     def _get_conversation_or_context(
         self, override_conversation: Optional[str]
     ) -> Optional[str]:
         """Returns what conversation to use - the overriden context, or the current conversation
-        context.
+        context. An empty uuid is never valid, so it counts as no override.
         """
-        conversation_to_use = self._current_conversation
-        if override_conversation is not None:
-            conversation_to_use = override_conversation
-        if conversation_to_use is None:
-            return None
-        return conversation_to_use
+        return override_conversation or self._current_conversation
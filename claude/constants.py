@@ -1,5 +1,6 @@
 """Global constants for the claude api."""
 from enum import Enum
+from types import MappingProxyType
 
 ####################################################################
 #                                                                  #
@@ -28,6 +29,11 @@ GENERATE_CHAT_TITLE_API_ENDPOINT = "/api/generate_chat_title"
 # API endpoint to send a message
 APPEND_MESSAGE_API_ENDPOINT = "/api/append_message"
 
+# API endpoint to send a message to a conversation and stream back the completion.
+SEND_MESSAGE_API_ENDPOINT = (
+    GET_CONVERSATIONS_API_ENDPOINT + "/{conversation_uuid}/completion"
+)
+
 # API endpoint to delete a conversation.
 DELETE_CONVERSATION_API_ENDPOINT = (
     GET_CONVERSATIONS_API_ENDPOINT + "/{conversation_uuid}"
@@ -44,9 +50,28 @@ RENAME_CONVERSATION_API_ENDPOINT = "/api/rename_chat"
 # API endpoint to upload a file and convert it to an attachment.
 CONVERT_DOCUMENT_API_ENDPOINT = "/api/convert_document"
 
+# Files up to this size are uploaded from memory when converting them to attachments,
+# bigger files are streamed from disk.
+IN_MEMORY_UPLOAD_MAX_BYTES = 1024 * 1024
+
+# How long the organizations a client is in are cached for, in seconds.
+ORGANIZATION_CACHE_TTL_SECONDS = 60
+
+# How long the names of recent conversations, used to generate new chat titles, are cached for,
+# in seconds.
+CONVERSATION_NAMES_CACHE_TTL_SECONDS = 30
+
+# How many times a request that was rate limited or hit a transient server error is retried
+# by default, and the base of the exponential back off between attempts, in seconds.
+MAX_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.5
+
+# Requests aren't retried if the server asks to wait longer than this, in seconds.
+MAX_RETRY_WAIT_SECONDS = 60
+
 # Common headers that are used to bypass 403s.
-# Note that this doesn't contain user agent.
-HEADERS = {
+# Note that this doesn't contain user agent. Read only, since clients share it.
+HEADERS = MappingProxyType({
     "content-type": "application/json",
     "authority": "claude.ai",
     "accept": "*/*",
@@ -57,7 +82,7 @@ HEADERS = {
     "sec-fetch-site": "same-origin",
     "upgrade-insecure-requests": "1",
     "connection": "keep-alive",
-}
+})
 
 # User agent you can use by default. Its reccomended to change this to the user agent your browser uses
 # when you log into anthropic. This is just here as a default.
@@ -77,8 +102,9 @@ class Timezone(str, Enum):
     NYC = "America/New_York"
     LA = "America/Los_Angeles"
 
-    def __str__(self) -> str:
-        return self.value
+    # Members are already their string values, so use str's own C level __str__ rather than
+    # a Python level override.
+    __str__ = str.__str__
 
 
 ###### Models
@@ -89,7 +115,6 @@ class Model(str, Enum):
     CLAUDE_SONNET = "claude-3-sonnet-20240229"
     CLAUDE_OPUS = "claude-3-opus-20240229"
 
-    def __str__(self) -> str:
-        return self.value
+    __str__ = str.__str__
 
 DEFAULT_MODEL = Model.CLAUDE_SONNET
\ No newline at end of file
@@ -1,19 +1,30 @@
-"""Home made barebones requests library with urllib since this helps bypass 
-Claude API protections.
+"""Home made barebones requests library with the standard library (http.client) since this
+helps bypass Claude API protections.
 """
-from dataclasses import dataclass
-import uuid
+import base64
+import collections.abc
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import functools
 import io
-import json
+import logging
 import mimetypes
-from typing import Optional, Union, Iterator, Tuple
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
-
-import sseclient
+import os
+import secrets
+import select
+import stat
+import sys
+import threading
+import zlib
+from typing import BinaryIO, Dict, Optional, Union, Iterator, Tuple, List
+from http.client import HTTPConnection, HTTPSConnection, HTTPResponse, HTTPException
+from urllib.parse import unquote, urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass
 
 from claude.custom_types import JsonType, HeaderType, FormDataType
+from claude import helpers
 from claude import logger
+from claude import rate_limiter
 
 
 ####################################################################
@@ -23,32 +34,80 @@ from claude import logger
 ####################################################################
 
 # Carriage return/line feed separator
-CRLF = "\r\n"
-
-
-@dataclass
+CRLF_BYTES = b"\r\n"
+# Prefix of a multipart boundary line, and suffix of the closing one.
+BOUNDARY_PREFIX = b"--"
+# Templates for the start of a form field, and the headers in front of a file's contents,
+# filled in with (separator, boundary line, name[, file name, content type]).
+_FIELD_PART_TEMPLATE = b'%b%b\r\ncontent-disposition: form-data; name="%b"\r\n\r\n%b'
+_FILE_PART_TEMPLATE = (
+    b'%b%b\r\ncontent-disposition: form-data; name="%b"; filename="%b"\r\n'
+    b"content-type: %b\r\n\r\n"
+)
+# Closing boundary of the form, filled in with the boundary line.
+_FOOTER_TEMPLATE = b"\r\n%b--\r\n"
+
+# Number of bytes of a file that are read at a time when streaming an upload.
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# What the session cookie is replaced with when request headers are logged.
+REDACTED_COOKIE = "sessionKey=***"
+
+# Most bytes of an event stream that are read at a time.
+SSE_READ_SIZE = 64 * 1024
+
+# (scheme, host, port) triple that identifies a connection pool.
+_PoolKey = Tuple[str, str, int]
+
+# Methods that are safe to send again if the connection failed after the request went out.
+_IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "DELETE"))
+
+# (host, port, proxy-authorization header or None) of the proxy a connection goes through.
+_Proxy = Tuple[str, int, Optional[str]]
+
+# Redirect statuses that Session.request() follows, and how many redirects it follows at most.
+# These match urllib's defaults.
+_REDIRECT_STATUS_CODES = frozenset((301, 302, 303, 307, 308))
+MAX_REDIRECTS = 10
+# Headers that describe a request body, and are dropped when a redirect turns a POST into a GET.
+_BODY_HEADERS = frozenset(("content-type", "content-length", "transfer-encoding"))
+# Headers that aren't sent on to a different host when following a redirect.
+_CREDENTIAL_HEADERS = frozenset(("cookie", "authorization"))
+
+# dataclass only generates __slots__ from Python 3.10 on.
+_SLOTS_OPTION = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(frozen=True, **_SLOTS_OPTION)
 class Response:
     """Wrapper for the return type for all custom requests methods.
-    Acts as a loose wrapper around requests.Response.
+    Acts as a loose wrapper around requests.Response. Responses are read only, and slotted
+    where supported, since one is built for every request.
     """
 
     ok: bool
     data: Union[bytes, str]
     status_code: Optional[int]
     error: Optional[str]
+    # Response headers, with lower cased names. Left out of the repr, since failed responses
+    # get logged and the headers can include set-cookie.
+    headers: Optional[HeaderType] = field(default=None, repr=False)
+
+    @property
+    def retry_after(self) -> Optional[float]:
+        """Seconds the server asked to wait before retrying, from the Retry-After header."""
+        if not self.headers:
+            return None
+        return rate_limiter.parse_retry_after(self.headers.get("retry-after"))
 
     def json(self) -> JsonType:
-        if isinstance(self.data, str):
-            return json.loads(self.data)
-        elif isinstance(self.data, bytes):
-            return json.loads(self.data.decode("utf-8"))
-        else:
-            raise RuntimeError("Decoding non-str or bytes type.")
+        # The JSON parser takes both str and bytes as is.
+        return helpers.json_loads(self.data)
 
 
 class FormData:
     """Since I'm doing this without the requests library, I also need to implement multipart
-    file uploads with urllib. This class basically reconstructs the binary encoded FormData
+    file uploads by hand. This class basically reconstructs the binary encoded FormData
     field thats sent in the request body of a POST request.
 
     Implementation inspired by this post:
@@ -83,7 +142,7 @@ class FormData:
         self._fields[key] = value
 
     def add_file(
-        self, field_name: str, file_name: str, file_open: io.BufferedReader
+        self, field_name: str, file_name: str, file_open: BinaryIO
     ) -> None:
         """Add an additional file to the field struct. Note that the |file_open| should be
         a call to open(file_name, 'rb').
@@ -92,51 +151,384 @@ class FormData:
 
     def encode(self) -> Tuple[str, bytes]:
         """Turn the form fields into a request body to send over requests."""
-        generated_boundary = f"{self._generate_boundary()}"
-        boundary_segment = f"--{generated_boundary}"
-
-        stream = io.BytesIO()
-        needsCRLF = False
+        # The whole body is built in memory anyway, so read each file in one go and join
+        # every part into the body with a single allocation.
+        content_type, _, body_chunks = self.stream(chunk_size=-1)
+        return content_type, b"".join(body_chunks)
+
+    def stream(
+        self, chunk_size: int = UPLOAD_CHUNK_SIZE
+    ) -> Tuple[str, Optional[int], Iterator[bytes]]:
+        """Like encode(), but returns the content length and an iterator over the request body
+        instead of the body itself. Files are only read, |chunk_size| bytes at a time (or whole
+        if it's -1), as the iterator is consumed, so uploads don't have to be held in memory.
+        The content length is None if a file isn't seekable.
+        """
+        generated_boundary = self._generate_boundary()
+        boundary_segment = BOUNDARY_PREFIX + generated_boundary.encode()
+
+        # The body in order, with each file represented by its open handle. Every part is
+        # formatted from a pre-encoded bytes template, and the parts between two files are
+        # joined into one chunk so that each of them goes out in a single write.
+        parts: List[Union[bytes, BinaryIO]] = []
+        pending: List[bytes] = []
+        separator = b""
         # Add fields to the form.
         for key, value in self._fields.items():
-            if needsCRLF:
-                stream.write(CRLF.encode())
-            needsCRLF = True
-            field_header = f'content-disposition: form-data; name="{key}"'
-            stream.write(
-                CRLF.join([boundary_segment, field_header, "", value]).encode()
+            pending.append(
+                _FIELD_PART_TEMPLATE
+                % (separator, boundary_segment, key.encode(), value.encode())
             )
+            separator = CRLF_BYTES
 
         # Add files to the form.
         for field_name, (file_name, file_open) in self._files.items():
-            if needsCRLF:
-                stream.write(CRLF.encode())
-            needsCRLF = True
-            field_header = f'content-disposition: form-data; name="{field_name}"; filename="{file_name}"'
-            content_type = (
-                mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+            content_type = _guess_content_type(file_name)
+            pending.append(
+                _FILE_PART_TEMPLATE
+                % (
+                    separator,
+                    boundary_segment,
+                    field_name.encode(),
+                    file_name.encode(),
+                    content_type.encode(),
+                )
             )
-            content_type_header = f"content-type: {content_type}"
-            stream.write(
-                CRLF.join(
-                    [boundary_segment, field_header, content_type_header, ""]
-                ).encode()
-            )
-            stream.write(CRLF.encode())
-            with file_open as f:
-                stream.write(f.read())
+            parts.append(b"".join(pending))
+            parts.append(file_open)
+            pending = []
+            separator = CRLF_BYTES
 
         # Footer
-        stream.write(f"{CRLF}--{generated_boundary}--{CRLF}".encode())
+        pending.append(_FOOTER_TEMPLATE % boundary_segment)
+        parts.append(b"".join(pending))
+
+        content_length: Optional[int] = 0
+        for part in parts:
+            if isinstance(part, bytes):
+                content_length += len(part)  # type: ignore
+                continue
+            file_size = _remaining_size(part)
+            if file_size is None:
+                # Files like pipes can't be measured up front, the body is sent chunked instead.
+                content_length = None
+                break
+            content_length += file_size  # type: ignore
         # Return the content type.
         content_type = f"multipart/form-data; boundary={generated_boundary}"
-        return content_type, stream.getvalue()
+        return content_type, content_length, self._iter_parts(parts, chunk_size)
+
+    def _iter_parts(
+        self, parts: List[Union[bytes, BinaryIO]], chunk_size: int
+    ) -> Iterator[bytes]:
+        """Yields the body parts, reading and then closing each file along the way."""
+        for part in parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+            with part as f:
+                yield from iter(functools.partial(f.read, chunk_size), b"")
 
     def _generate_boundary(self) -> str:
-        """Genarates a unique boundary per call. For now this is just a uuid, it doesn't need to be
-        anything special.
+        """Genarates a unique boundary per call. For now this is just 32 random hex digits, it
+        doesn't need to be anything special.
+        """
+        return secrets.token_hex(16)
+
+
+def _remaining_size(file: BinaryIO) -> Optional[int]:
+    """Returns how many bytes are left to read from |file|, without reading them, or None if
+    that can't be known up front.
+    """
+    try:
+        file_stat = os.fstat(file.fileno())
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        file_stat = None
+    if file_stat is not None and stat.S_ISREG(file_stat.st_mode):
+        # Regular files on disk know their size, so there is no need to seek to the end.
+        return max(0, file_stat.st_size - file.tell())
+    if not file.seekable():
+        return None
+    position = file.tell()
+    size = file.seek(0, io.SEEK_END) - position
+    file.seek(position)
+    return size
+
+
+class Session:
+    """Keeps persistent HTTP connections around so that consecutive requests to the same
+    host reuse a single TCP + TLS connection instead of doing a new handshake per call.
+
+    urllib always sends `Connection: close`, so the session talks to http.client directly.
+    Idle connections are pooled per (scheme, host, port); at most |pool_connections| hosts
+    are tracked, with up to |pool_maxsize| idle connections kept for each of them.
+
+    Like urllib, the session goes through the proxies set in the HTTP(S)_PROXY and NO_PROXY
+    environment variables, and request() follows redirects.
+    """
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 16):
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pools: "OrderedDict[_PoolKey, List[HTTPConnection]]" = OrderedDict()
+        # The proxy, if any, for each (scheme, host, port), looked up on first use.
+        self._proxies: Dict[_PoolKey, Optional[_Proxy]] = {}
+        self._lock = threading.Lock()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: HeaderType,
+        body: Optional[Union[bytes, Iterator[bytes]]] = None,
+    ) -> Response:
+        """Sends a request over a pooled connection and reads the full response. Redirects
+        are followed the way urllib follows them: GET and HEAD requests are sent on as they
+        are, and POSTs answered with a 301, 302 or 303 become GETs without a body.
+        """
+        for _ in range(MAX_REDIRECTS):
+            response = self._request_once(method, url, headers, body)
+            location = (response.headers or {}).get("location")
+            if response.status_code not in _REDIRECT_STATUS_CODES or not location:
+                return response
+            if method == "POST" and response.status_code in (301, 302, 303):
+                method = "GET"
+                body = None
+                headers = {
+                    name: value for name, value in headers.items() if name.lower() not in _BODY_HEADERS
+                }
+            elif method not in ("GET", "HEAD"):
+                return response
+            redirect_url = urljoin(url, location)
+            redirect_parts = urlsplit(redirect_url)
+            if redirect_parts.scheme.lower() not in ("http", "https"):
+                return response
+            if redirect_parts.hostname != urlsplit(url).hostname:
+                # Don't hand the session cookie to another host.
+                headers = {
+                    name: value
+                    for name, value in headers.items()
+                    if name.lower() not in _CREDENTIAL_HEADERS
+                }
+            logger.logger.info("Following %s redirect to %s.", response.status_code, redirect_url)
+            url = redirect_url
+        return Response(
+            ok=False,
+            data=b"",
+            status_code=response.status_code,
+            error=f"Stopped after {MAX_REDIRECTS} redirects.",
+            headers=response.headers,
+        )
+
+    def _request_once(
+        self,
+        method: str,
+        url: str,
+        headers: HeaderType,
+        body: Optional[Union[bytes, Iterator[bytes]]] = None,
+    ) -> Response:
+        """Sends a single request and reads the full response, without following redirects."""
+        try:
+            key, connection, response = self._open(method, url, headers, body)
+        except (HTTPException, OSError) as e:
+            return Response(ok=False, data=b"", status_code=None, error=str(e))
+
+        try:
+            data = response.read()
+        except (HTTPException, OSError) as e:
+            connection.close()
+            return Response(ok=False, data=b"", status_code=response.status, error=str(e))
+        self._release(key, connection, response)
+
+        response_headers = {name.lower(): value for name, value in response.getheaders()}
+        # Bodiless responses, like a 204 or the answer to a HEAD, can still claim to be gzipped.
+        if data and response_headers.get("content-encoding", "").lower() == "gzip":
+            try:
+                data = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+            except zlib.error as e:
+                return Response(
+                    ok=False,
+                    data=b"",
+                    status_code=response.status,
+                    error=f"Undecodable gzip response: {e}",
+                    headers=response_headers,
+                )
+        if not 200 <= response.status < 300:
+            return Response(
+                ok=False,
+                data=data,
+                status_code=response.status,
+                error=f"HTTP Error {response.status}: {response.reason}",
+                headers=response_headers,
+            )
+        return Response(
+            ok=True, data=data, status_code=response.status, error=None, headers=response_headers
+        )
+
+    def close(self) -> None:
+        """Closes every idle connection in the pool."""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            for connection in pool:
+                connection.close()
+
+    def _open(
+        self,
+        method: str,
+        url: str,
+        headers: HeaderType,
+        body: Optional[Union[bytes, Iterator[bytes]]] = None,
+    ) -> Tuple[_PoolKey, HTTPConnection, HTTPResponse]:
+        """Sends the request and returns once the response headers are read. The caller owns
+        the connection until it hands it back with _release().
         """
-        return str(uuid.uuid4()).replace("-", "")
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname or "", port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        proxy = self._get_proxy(key)
+        if proxy is not None and scheme == "http":
+            # Plain HTTP goes to the proxy with the full url, HTTPS is tunneled through it.
+            path = url.split("#", 1)[0]
+            if proxy[2] is not None:
+                headers = {**headers, "proxy-authorization": proxy[2]}
+
+        connection, reused = self._acquire(key)
+        # Streamed bodies can't be replayed once they have been (partially) sent.
+        replayable = reused and isinstance(body, (bytes, type(None)))
+        try:
+            connection.request(method, path, body=body, headers=headers)
+        except (HTTPException, OSError):
+            connection.close()
+            # Failing to send means the server dropped the idle connection before it got the
+            # request, so it's safe to send it again whatever the method is.
+            if not replayable:
+                raise
+        else:
+            try:
+                return key, connection, connection.getresponse()
+            except (HTTPException, OSError):
+                connection.close()
+                # The server may have acted on the request before the connection failed, so
+                # only requests that can't create anything twice are sent again.
+                if not replayable or method not in _IDEMPOTENT_METHODS:
+                    raise
+        # The server is free to drop an idle keep-alive connection, so a failure on a reused
+        # connection is retried once on a fresh one.
+        logger.logger.info("Pooled connection to %s was closed, reconnecting.", key[1])
+        connection = self._new_connection(key)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            return key, connection, connection.getresponse()
+        except (HTTPException, OSError):
+            connection.close()
+            raise
+
+    def _acquire(self, key: _PoolKey) -> Tuple[HTTPConnection, bool]:
+        """Returns an idle connection for |key| if there is one, otherwise a new connection.
+        The bool is true if the connection was reused. Idle connections that the server has
+        already closed are thrown away rather than handed out.
+        """
+        dropped: List[HTTPConnection] = []
+        connection = None
+        with self._lock:
+            pool = self._pools.get(key)
+            while pool:
+                candidate = pool.pop()
+                if _is_dropped(candidate):
+                    dropped.append(candidate)
+                else:
+                    connection = candidate
+                    break
+        for dropped_connection in dropped:
+            dropped_connection.close()
+        if connection is not None:
+            return connection, True
+        return self._new_connection(key), False
+
+    def _release(self, key: _PoolKey, connection: HTTPConnection, response: HTTPResponse) -> None:
+        """Puts |connection| back into the pool if |response| was fully consumed and the server
+        is keeping the connection alive. Otherwise the connection is closed.
+        """
+        if not response.isclosed() or response.will_close:
+            connection.close()
+            return
+
+        evicted: List[HTTPConnection] = []
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = []
+                while len(self._pools) > self._pool_connections:
+                    _, stale_pool = self._pools.popitem(last=False)
+                    evicted.extend(stale_pool)
+            self._pools.move_to_end(key)
+            pool = self._pools[key]
+            if len(pool) < self._pool_maxsize:
+                pool.append(connection)
+            else:
+                evicted.append(connection)
+        for stale_connection in evicted:
+            stale_connection.close()
+
+    def _new_connection(self, key: _PoolKey) -> HTTPConnection:
+        scheme, host, port = key
+        proxy = self._get_proxy(key)
+        if proxy is None:
+            if scheme == "https":
+                return HTTPSConnection(host, port)
+            return HTTPConnection(host, port)
+        proxy_host, proxy_port, proxy_authorization = proxy
+        if scheme == "https":
+            connection = HTTPSConnection(proxy_host, proxy_port)
+            tunnel_headers = {}
+            if proxy_authorization is not None:
+                tunnel_headers["Proxy-Authorization"] = proxy_authorization
+            connection.set_tunnel(host, port, headers=tunnel_headers)
+            return connection
+        return HTTPConnection(proxy_host, proxy_port)
+
+    def _get_proxy(self, key: _PoolKey) -> Optional[_Proxy]:
+        """Returns the proxy that requests for |key| go through, or None to connect directly."""
+        if key in self._proxies:
+            return self._proxies[key]
+        scheme, host, port = key
+        proxy_url = getproxies().get(scheme)
+        proxy = None
+        if proxy_url and not proxy_bypass(f"{host}:{port}"):
+            if "://" not in proxy_url:
+                proxy_url = "http://" + proxy_url
+            proxy_parts = urlsplit(proxy_url)
+            proxy_authorization = None
+            if proxy_parts.username is not None:
+                credentials = f"{unquote(proxy_parts.username)}:{unquote(proxy_parts.password or '')}"
+                proxy_authorization = "Basic " + base64.b64encode(credentials.encode()).decode()
+            proxy = (proxy_parts.hostname or "", proxy_parts.port or 80, proxy_authorization)
+        self._proxies[key] = proxy
+        return proxy
+
+
+def _is_dropped(connection: HTTPConnection) -> bool:
+    """Returns true if the server closed the idle |connection|. Nothing is expected on an idle
+    connection, so it being readable means the server closed it (or broke the protocol).
+    """
+    if connection.sock is None:
+        # Not connected yet, it connects on the next request.
+        return False
+    try:
+        readable, _, _ = select.select([connection.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+# Used by the request methods when they aren't given a session, so that even one off calls
+# reuse connections to the API host.
+_default_session = Session()
 
 
 ####################################################################
@@ -146,92 +538,252 @@ class FormData:
 ####################################################################
 
 
-def post_form_data(url: str, headers: HeaderType, files: FormDataType) -> Response:
-    """Wrapper function to send over a form data over POST request."""
-    form_data_obj = FormData(files)
-    content_type, encoded_request_body = form_data_obj.encode()
-    # Don't modify the passed in header.
-    header_copy = headers.copy()
-    # Transparently add the content type and content length header information
-    # based on the information we decoded.
-    header_copy.update({"content-type": content_type})
-    header_copy.update({"content-length": str(len(encoded_request_body))})
-    return post(url, headers=header_copy, request_body=encoded_request_body)
+# mimetypes loads the system's type maps on first use. Do that up front, rather than during the
+# first upload, where it could also race between threads uploading at once.
+mimetypes.init()
 
 
-def get(url: str, headers: HeaderType) -> Response:
-    """Public method for a GET Request."""
-    logger.logger.info("Sending GET request to: %s with headers: %s", url, str(headers))
-    request = Request(url)
-    for header_key, header_value in headers.items():
-        request.add_header(header_key, header_value)
+def _guess_content_type(file_name: str) -> str:
+    """Guesses the content type of a file upload from the extension of its name."""
+    return _guess_extension_content_type(os.path.splitext(file_name)[1].lower())
 
-    return _safe_request_read(request)
 
+@functools.lru_cache(maxsize=256)
+def _guess_extension_content_type(extension: str) -> str:
+    """Guesses the content type of files with |extension|. Cached, since mimetypes does its
+    lookups in Python and uploads tend to repeat the same few file types.
+    """
+    return mimetypes.guess_type("file" + extension)[0] or "application/octet-stream"
 
-def post(
-    url: str, headers: HeaderType, request_body: Optional[Union[JsonType, bytes]] = None
+
+def _redact_cookie(headers: HeaderType) -> HeaderType:
+    """Returns |headers| with the session cookie hidden, for logging."""
+    if "cookie" in headers:
+        return {**headers, "cookie": REDACTED_COOKIE}
+    return headers
+
+
+def post_form_data(
+    url: str, headers: HeaderType, files: FormDataType, session: Optional[Session] = None
 ) -> Response:
-    """Public method for a POST Request."""
-    logger.logger.info("Sending POST request to: %s with headers: %s", url, str(headers))
-    request = Request(url, method="POST")
-    for header_key, header_value in headers.items():
-        request.add_header(header_key, header_value)
+    """Wrapper function to send over a form data over POST request."""
+    form_data_obj = FormData(files)
+    # The body is streamed so that files are sent straight from disk.
+    content_type, content_length, request_body = form_data_obj.stream()
+    # Transparently add the content type and content length header information
+    # based on the information we decoded, without modifying the passed in header.
+    header_copy = {
+        **headers,
+        "content-type": content_type,
+    }
+    # Without a content length, the body is sent with chunked transfer encoding.
+    if content_length is not None:
+        header_copy["content-length"] = str(content_length)
+    return post(url, headers=header_copy, request_body=request_body, session=session)
+
+
+def get(url: str, headers: HeaderType, session: Optional[Session] = None) -> Response:
+    """Public method for a GET Request."""
+    if logger.logger.isEnabledFor(logging.INFO):
+        logger.logger.info(
+            "Sending GET request to: %s with headers: %s", url, _redact_cookie(headers)
+        )
+    if session is None:
+        session = _default_session
+    return session.request("GET", url, headers)
 
 
+def post(
+    url: str,
+    headers: HeaderType,
+    request_body: Optional[Union[JsonType, bytes, Iterator[bytes]]] = None,
+    session: Optional[Session] = None,
+) -> Response:
+    """Public method for a POST Request. An iterator |request_body| is streamed as is, with
+    chunked transfer encoding unless a content-length header is given.
+    """
+    if logger.logger.isEnabledFor(logging.INFO):
+        logger.logger.info(
+            "Sending POST request to: %s with headers: %s", url, _redact_cookie(headers)
+        )
     encoded_request_body = None
     if request_body is not None:
         logger.logger.info("POST request body is non-empty.")
         if isinstance(request_body, bytes):
             logger.logger.info("POST request body is bytes type.")
             encoded_request_body = request_body
+        elif isinstance(request_body, collections.abc.Iterator):
+            logger.logger.info("POST request body is a stream, sending as is.")
+            encoded_request_body = request_body
         elif isinstance(request_body, str):
             logger.logger.info("POST request body is string type, encoding.")
             encoded_request_body = request_body.encode()
         else:
             logger.logger.info("POST request body is JSON type, dumping then encoding.")
-            encoded_request_body = json.dumps(request_body).encode()
-    return _safe_request_read(request, data=encoded_request_body)
+            encoded_request_body = helpers.json_dumps(request_body)
+    if session is None:
+        session = _default_session
+    return session.request("POST", url, headers, body=encoded_request_body)
 
 
 def sse(
-    url: str, headers: HeaderType, request_body: Optional[JsonType] = None
-) -> Iterator[str]:
-    """Public method for a POST request that requires SSE."""
-    logger.logger.info("Sending SSE POST request to: %s with headers: %s", url, str(headers))
-    request = Request(url, method="POST")
-    for header_key, header_value in headers.items():
-        request.add_header(header_key, header_value)
-
-    encoded_request_body = json.dumps(request_body).encode()
+    url: str,
+    headers: HeaderType,
+    request_body: Optional[JsonType] = None,
+    session: Optional[Session] = None,
+) -> Iterator[bytes]:
+    """Public method for a POST request that requires SSE. Yields the raw data of each event."""
+    if logger.logger.isEnabledFor(logging.INFO):
+        logger.logger.info(
+            "Sending SSE POST request to: %s with headers: %s", url, _redact_cookie(headers)
+        )
+    _, events = open_sse(url, headers, request_body, session=session)
+    yield from events
+
+
+def open_sse(
+    url: str,
+    headers: HeaderType,
+    request_body: Optional[JsonType] = None,
+    session: Optional[Session] = None,
+) -> Tuple[Response, Iterator[bytes]]:
+    """Like sse(), but sends the request right away and also returns the response status. The
+    Response has no data if the request succeeded, in which case the iterator yields the raw
+    data of each event. Otherwise the iterator is empty. A successful stream has to be read to
+    the end for its connection to go back into the pool.
+    """
+    encoded_request_body = helpers.json_dumps(request_body)
+    if session is None:
+        session = _default_session
     try:
-        response = urlopen(request, data=encoded_request_body)
-        client = sseclient.SSEClient(response)
-        for event in client.events():
-            yield event.data
-    except (HTTPError, URLError) as e:
-        logger.logger.info("SEE POST failed with error: %s", str(e))
-        print(e)
-
-
-def delete(url: str, headers: HeaderType) -> Response:
+        key, connection, response = session._open("POST", url, headers, encoded_request_body)
+    except (HTTPException, OSError) as e:
+        logger.logger.warning("SSE POST failed with error: %s", e)
+        return Response(ok=False, data=b"", status_code=None, error=str(e)), iter(())
+
+    response_headers = {name.lower(): value for name, value in response.getheaders()}
+    if 200 <= response.status < 300:
+        return (
+            Response(
+                ok=True, data=b"", status_code=response.status, error=None, headers=response_headers
+            ),
+            _session_sse(session, key, connection, response),
+        )
+
+    logger.logger.warning("SSE POST failed with status: %s %s", response.status, response.reason)
+    try:
+        data = response.read()
+    except (HTTPException, OSError):
+        data = b""
+    session._release(key, connection, response)
+    return (
+        Response(
+            ok=False,
+            data=data,
+            status_code=response.status,
+            error=f"HTTP Error {response.status}: {response.reason}",
+            headers=response_headers,
+        ),
+        iter(()),
+    )
+
+
+def delete(url: str, headers: HeaderType, session: Optional[Session] = None) -> Response:
     """Public method for a DELETE request."""
-    logger.logger.info("Sending DELETE request to: %s with headers: %s", url, str(headers))
-    request = Request(url, method="DELETE")
-    for header_key, header_value in headers.items():
-        request.add_header(header_key, header_value)
-
-    return _safe_request_read(request)
+    if logger.logger.isEnabledFor(logging.INFO):
+        logger.logger.info(
+            "Sending DELETE request to: %s with headers: %s", url, _redact_cookie(headers)
+        )
+    if session is None:
+        session = _default_session
+    return session.request("DELETE", url, headers)
+
+
+def _session_sse(
+    session: Session, key: _PoolKey, connection: HTTPConnection, response: HTTPResponse
+) -> Iterator[bytes]:
+    """Streams the SSE events of a successful |response| on a pooled session connection. The
+    connection only goes back into the pool if the stream was read to the end.
+    """
+    try:
+        yield from _iter_event_data(_iter_response_chunks(response))
+    except (HTTPException, OSError, zlib.error) as e:
+        logger.logger.warning("SSE POST failed with error: %s", e)
+    finally:
+        session._release(key, connection, response)
 
 
-def _safe_request_read(request: Request, data: Optional[bytes] = None) -> Response:
-    """Read a request with some data and return the response. Handles packaging
-    the response in a Response Wrapper object.
+def _iter_response_chunks(response: HTTPResponse) -> Iterator[bytes]:
+    """Returns an iterator over the body of |response| as it arrives, decompressed if the server
+    gzipped it.
     """
-    status_code = None
-    try:
-        with urlopen(request, data=data) as response:
-            status_code = response.getcode()
-            return Response(ok=True, data=response.read(), status_code=status_code, error=None)
-    except (HTTPError, URLError) as e:
-        return Response(ok=False, data=b"", status_code=status_code, error=str(e))
+    chunks = _iter_read1(response)
+    if (response.getheader("content-encoding") or "").lower() == "gzip":
+        return _iter_gunzipped(chunks)
+    return chunks
+
+
+def _iter_read1(response: HTTPResponse) -> Iterator[bytes]:
+    """Yields the body of |response| as it arrives, until it's used up."""
+    while True:
+        chunk = response.read1(SSE_READ_SIZE)
+        if not chunk:
+            break
+        yield chunk
+    # read1() doesn't mark a response with a content length as closed once all of it has been
+    # read, while read() does. Without that, the connection wouldn't go back to the pool.
+    response.read()
+
+
+def _iter_gunzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Decompresses a gzipped body as its |chunks| arrive."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    data = decompressor.flush()
+    if data:
+        yield data
+
+
+def _iter_event_data(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Yields the data of every SSE event in the body |chunks| as raw bytes, so that it can go
+    straight to the JSON parser without a round trip through str. Events without data, like
+    keep alive pings, are skipped so that callers don't try to parse them.
+    """
+    data_lines: List[bytes] = []
+    # Whatever followed the last newline that was read, i.e. the start of the next line.
+    pending = b""
+    # Each chunk is whatever has arrived, split into lines in one go rather than going
+    # through the response's readline() for every line.
+    for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            if not line:
+                # A blank line ends the current event.
+                if data_lines:
+                    data = b"\n".join(data_lines)
+                    data_lines = []
+                    if data and not data.isspace():
+                        yield data
+                continue
+            if line.startswith(b"data:"):
+                value = line[5:]
+                if value.startswith(b" "):
+                    value = value[1:]
+                data_lines.append(value)
+            # Comments and the event/id/retry fields aren't used by the API.
+
+    if pending.startswith(b"data:"):
+        value = pending[5:].rstrip(b"\r")
+        if value.startswith(b" "):
+            value = value[1:]
+        data_lines.append(value)
+    if data_lines:
+        data = b"\n".join(data_lines)
+        if data and not data.isspace():
+            yield data
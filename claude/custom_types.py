@@ -1,5 +1,4 @@
-import io
-from typing import Union, Dict, List, Any, Tuple
+from typing import BinaryIO, Union, Dict, List, Any, Mapping, Tuple
 
 ####################################################################
 #                                                                  #
@@ -9,10 +8,11 @@ from typing import Union, Dict, List, Any, Tuple
 
 # Types for sending requests
 JsonType = Union[str, int, float, bool, None, Dict[str, Any], List[Any]]
-HeaderType = Dict[str, str]
+# Headers are only ever read by the request methods, so any mapping will do.
+HeaderType = Mapping[str, str]
 
 # Types for form data specific information.
-FormDataType = Dict[str, Union[str, Tuple[str, io.BufferedReader]]]
+FormDataType = Dict[str, Union[str, Tuple[str, BinaryIO]]]
 
 
 
@@ -1,16 +1,58 @@
 """Generic helper functions for random utilities."""
+import codecs
 from typing import Tuple, Optional
 
+from claude.custom_types import JsonType
 
-def is_file_text_based(file_path: str) -> Tuple[bool, Optional[str]]:
+try:
+    # orjson is an optional dependency that parses JSON (including raw bytes) much faster
+    # than the standard library, and serializes straight to bytes.
+    from orjson import loads as json_loads
+    from orjson import dumps as json_dumps
+except ImportError:
+    import json
+    from json import loads as json_loads
+
+    def json_dumps(obj: JsonType) -> bytes:  # type: ignore
+        """Serializes |obj| to compact UTF-8 encoded JSON, like orjson.dumps. Non-ASCII text
+        is written as is rather than as \\u escapes, which keeps long prompts smaller.
+        """
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# How much of a file is looked at first to tell whether it's text based. Binary files almost
+# always give themselves away early with invalid UTF-8.
+TEXT_SNIFF_BYTES = 8 * 1024
+
+
+def is_file_text_based(file_path: str) -> Tuple[bool, bytes, Optional[str]]:
     """Really bad way to determine whether or not a file is text based or not.
     This is used so that we don't upload non-binary files to the file converstion
     API.
 
-    Returns [bool, file contents], where bool is true if the file is text-based.
+    Returns [bool, raw file contents, decoded file contents], where bool is true if the
+    file is text-based. The decoded contents are None if the file isn't text-based, and have
+    their line endings normalized to \\n like a text mode read otherwise. The
+    raw contents that were read are returned either way so callers don't have to read the
+    file again. They are the whole file unless its first TEXT_SNIFF_BYTES already showed
+    that it's binary, in which case the rest isn't read.
     """
+    with open(file_path, "rb") as f:
+        head = f.read(TEXT_SNIFF_BYTES)
+        # Only whole characters are checked, since the sniffed bytes can end in the middle
+        # of a multi-byte character.
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        except UnicodeDecodeError:
+            return False, head, None
+        raw_contents = head + f.read()
+    # Decode the raw bytes in one go, rather than going through the incremental text mode
+    # decoder.
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return True, f.read()
+        contents = raw_contents.decode("utf-8")
     except UnicodeDecodeError:
-        return False, None
+        return False, raw_contents, None
+    # Translate line endings like reading the file in text mode would.
+    if "\r" in contents:
+        contents = contents.replace("\r\n", "\n").replace("\r", "\n")
+    return True, raw_contents, contents
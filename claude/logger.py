@@ -1,12 +1,19 @@
 import logging
 
-logger = logging
+# Every module of the library logs through this logger. Nothing is printed unless the
+# application configures logging itself, or calls configure().
+logger = logging.getLogger("claude")
+logger.addHandler(logging.NullHandler())
 
 OLD_FORMAT = '%(asctime)s:%(name)s:%(levelname)s - %(message)s'
-FORMAT = '[%(asctime)s:%(name)s:%(levelname)s][%(filename)s:%(lineno)s - %(funcName)s() ] %(message)s'
+FORMAT = '[%(asctime)s:%(name)s:%(levelname)s] %(message)s'
+# Also shows where each record was logged from.
+DETAILED_FORMAT = '[%(asctime)s:%(name)s:%(levelname)s][%(filename)s:%(lineno)s - %(funcName)s() ] %(message)s'
 
-logger.basicConfig(
-    level=logging.DEBUG,
-    format=FORMAT,
-    datefmt='%d-%b-%y %H:%M:%S'
-)
+
+def configure(level: int = logging.INFO, fmt: str = FORMAT) -> None:
+    """Prints the library's logs at |level| and above to stderr, formatted with |fmt|."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(fmt, datefmt='%d-%b-%y %H:%M:%S'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
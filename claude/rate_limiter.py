@@ -0,0 +1,83 @@
+"""Client side rate limiting for API requests."""
+import collections
+import email.utils
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """Sliding window rate limiter that lets at most |max_requests| requests through per
+    |period| seconds. acquire() blocks until the next request is allowed to go out.
+
+    Staying under the server's limit up front is cheaper than getting a 429 and backing off.
+    When the server rate limits us anyway, slow_down() halves the number of requests let
+    through per period. It then grows back by one request for every period without another
+    slow down. Safe to share between threads.
+    """
+
+    def __init__(self, max_requests: int, period: float):
+        if max_requests < 1 or period <= 0:
+            raise ValueError("Rate limit needs at least one request per positive period.")
+        self._max_requests = max_requests
+        self._period = period
+        # Requests currently let through per period, at most |max_requests|, see slow_down().
+        self._limit = max_requests
+        self._limit_changed_at = 0.0
+        # Send times of the most recent requests, oldest first.
+        self._sent = collections.deque(maxlen=max_requests)
+        # No requests go out before this time, see pause().
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until a request can be sent, and records it as sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self._limit < self._max_requests and now - self._limit_changed_at >= self._period:
+                    self._limit += 1
+                    self._limit_changed_at = now
+                wait = self._paused_until - now
+                if len(self._sent) >= self._limit:
+                    wait = max(wait, self._sent[-self._limit] + self._period - now)
+                if wait <= 0:
+                    self._sent.append(now)
+                    return
+            # Sleep without the lock, so that other threads can pause() or slow_down() in the
+            # meantime. Whatever they changed is picked up when checking again.
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Holds back every request for the next |seconds|, e.g. when the server asks us to
+        retry later.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def slow_down(self) -> None:
+        """Halves the number of requests let through per period, e.g. when the server rate
+        limited a request even though we stayed under the configured limit.
+        """
+        with self._lock:
+            self._limit = max(1, self._limit // 2)
+            self._limit_changed_at = time.monotonic()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header, which is either a number of seconds or an HTTP date,
+    into the number of seconds to wait. Returns None if it can't be parsed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
@@ -17,9 +17,10 @@ setup(
     long_description=long_description,
     long_description_content_type='text/markdown',
     py_modules=find_packages(),
-    install_requires=[
-        'sseclient-py',
-    ],
+    install_requires=[],
+    extras_require={
+        'fast': ['orjson'],
+    },
     classifiers=[
         'Development Status :: 3 - Alpha',
         'Intended Audience :: Developers',
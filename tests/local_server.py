@@ -0,0 +1,75 @@
+"""Local HTTP server for tests that need to talk to a real server."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+import unittest
+from unittest import mock
+from typing import List, Tuple, Type
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    """Keep-alive request handler that records every request and connection it sees. Subclasses
+    implement respond() to answer requests.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections.append(self.client_address)  # type: ignore
+
+    def log_message(self, *args):
+        pass
+
+    def read_body(self) -> bytes:
+        if self.headers.get("transfer-encoding") == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("content-length") or 0))
+
+    def send(self, status: int, body: bytes = b"", headers: Tuple[Tuple[str, str], ...] = ()):
+        self.send_response(status)
+        self.send_header("content-length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self):
+        body = self.read_body()
+        self.server.requests.append((self.command, self.path, dict(self.headers), body))  # type: ignore
+        self.respond(body)
+
+    def respond(self, body: bytes):
+        raise NotImplementedError
+
+    do_GET = do_POST = do_DELETE = handle_request
+
+
+def start_server(test: unittest.TestCase, handler: Type[RecordingHandler]) -> Tuple[ThreadingHTTPServer, str]:
+    """Starts a server for |test| that answers with |handler|, and stops it when the test is
+    done. Returns the server, with its recorded `requests` and `connections`, and its base url.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.requests: List[Tuple[str, str, dict, bytes]] = []  # type: ignore
+    server.connections: List[Tuple[str, int]] = []  # type: ignore
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+
+    test.addCleanup(stop)
+    # Talk to the server directly, even if the environment sets a proxy.
+    environ = mock.patch.dict(os.environ, {"no_proxy": "127.0.0.1", "NO_PROXY": "127.0.0.1"})
+    environ.start()
+    test.addCleanup(environ.stop)
+    return server, f"http://127.0.0.1:{server.server_port}"
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import unittest
+
+from claude import async_claude_client
+
+
+class IterateInExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = async_claude_client.AsyncClaudeClient("key")
+        self.addCleanup(lambda: asyncio.run(self.client.close()))
+
+    def test_yields_every_item_in_order(self):
+        async def collect():
+            return [item async for item in self.client._iterate_in_executor(iter(range(200)))]
+
+        self.assertEqual(asyncio.run(collect()), list(range(200)))
+
+    def test_errors_reach_the_caller(self):
+        def items():
+            yield 1
+            raise ValueError("broken stream")
+
+        async def collect():
+            return [item async for item in self.client._iterate_in_executor(items())]
+
+        with self.assertRaisesRegex(ValueError, "broken stream"):
+            asyncio.run(collect())
+
+    def test_read_ahead_is_bounded_and_stops_with_the_caller(self):
+        produced = []
+        closed = threading.Event()
+
+        def items():
+            try:
+                for item in range(10 * async_claude_client.STREAM_READ_AHEAD):
+                    produced.append(item)
+                    yield item
+            finally:
+                closed.set()
+
+        async def read_one():
+            stream = self.client._iterate_in_executor(items())
+            await stream.__anext__()
+            await asyncio.sleep(0.3)
+            read_ahead = len(produced)
+            await stream.aclose()
+            return read_ahead
+
+        read_ahead = asyncio.run(read_one())
+        # The item that was read, a full queue, and the one waiting for room in it.
+        self.assertLessEqual(read_ahead, async_claude_client.STREAM_READ_AHEAD + 2)
+        self.assertTrue(closed.wait(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
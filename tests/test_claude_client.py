@@ -0,0 +1,126 @@
+import unittest
+from unittest import mock
+
+from claude import claude_client
+from claude import constants
+
+from local_server import RecordingHandler, start_server
+
+
+class _Handler(RecordingHandler):
+    """Answers the first request to every path with the status in its `status` query parameter,
+    and every following one with a 200.
+    """
+
+    def respond(self, body):
+        path, _, query = self.path.partition("?")
+        seen = sum(1 for request in self.server.requests if request[1] == self.path)  # type: ignore
+        if seen == 1 and query.startswith("status="):
+            self.send(int(query[len("status="):]), headers=(("retry-after", "0"),))
+        elif path.endswith("/completion"):
+            self.send(200, b'data: {"completion":"hi","stop_reason":"stop_sequence"}\n\n')
+        elif path.endswith("/bad-completion"):
+            self.send(
+                200,
+                b'data: {"completion":"a","stop_reason":null}\n\n'
+                b'data: {"completion":"\\q","stop_reason":null}\n\n'
+                b'data: {"completion":"\xff","stop_reason":null}\n\n'
+                b'data: {"completion":"b","stop_reason":"stop_sequence"}\n\n',
+            )
+        else:
+            self.send(200, b'{"ok":true}')
+
+
+class RetryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server, base_url = start_server(self, _Handler)
+        self.client = claude_client.ClaudeClient("key", base_url=base_url, max_retries=2)
+        self.addCleanup(self.client.close)
+        self.base_url = base_url
+        patcher = mock.patch.object(claude_client.time, "sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _sent(self):
+        return [(method, path) for method, path, _, _ in self.server.requests]
+
+    def _request(self, request_method, path, **kwargs):
+        return self.client._request(
+            request_method, self.base_url + path, headers=self.client._default_header, **kwargs
+        )
+
+    def test_server_errors_are_retried_for_gets_and_deletes(self):
+        for request_method, method in (
+            (claude_client.custom_requests.get, "GET"),
+            (claude_client.custom_requests.delete, "DELETE"),
+        ):
+            with self.subTest(method=method):
+                path = f"/{method}?status=503"
+                self.assertTrue(self._request(request_method, path).ok)
+                self.assertEqual(self._sent().count((method, path)), 2)
+
+    def test_server_errors_are_not_retried_for_posts(self):
+        response = self._request(claude_client.custom_requests.post, "/post?status=502")
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(self._sent(), [("POST", "/post?status=502")])
+        self.sleep.assert_not_called()
+
+    def test_rate_limited_posts_are_retried(self):
+        response = self._request(claude_client.custom_requests.post, "/post?status=429")
+        self.assertTrue(response.ok)
+        self.assertEqual(self._sent().count(("POST", "/post?status=429")), 2)
+
+    def test_retries_stop_after_max_retries(self):
+        with mock.patch.object(
+            self.server.RequestHandlerClass, "respond", lambda handler, body: handler.send(503)
+        ):
+            response = self._request(claude_client.custom_requests.get, "/always")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self._sent()), 3)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_retries_wait_with_exponential_back_off(self):
+        with mock.patch.object(claude_client.random, "random", return_value=0.0), mock.patch.object(
+            self.server.RequestHandlerClass, "respond", lambda handler, body: handler.send(503)
+        ):
+            self._request(claude_client.custom_requests.get, "/always")
+        self.assertEqual(
+            [call[0][0] for call in self.sleep.call_args_list],
+            [constants.RETRY_BACKOFF_SECONDS, constants.RETRY_BACKOFF_SECONDS * 2],
+        )
+
+    def test_no_retries_for_client_errors(self):
+        response = self._request(claude_client.custom_requests.get, "/get?status=404")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(self._sent()), 1)
+
+    def test_unauthorized_drops_cached_organizations(self):
+        self.client._organization_cache = (0.0, [], {})
+        self._request(claude_client.custom_requests.get, "/get?status=401")
+        self.assertIsNone(self.client._organization_cache)
+
+    def test_rate_limited_streamed_message_is_retried(self):
+        self.client._send_message_url = lambda **uuids: self.base_url + "/completion?status=429"
+        response = self.client.send_message("org", "conversation", "hi", [], "tz", "model")
+        self.assertEqual(response["completion"], "hi")
+        self.assertEqual(self._sent().count(("POST", "/completion?status=429")), 2)
+
+    def test_undecodable_chunks_are_skipped(self):
+        self.client._send_message_url = lambda **uuids: self.base_url + "/bad-completion"
+        response = self.client.send_message("org", "conversation", "hi", [], "tz", "model")
+        self.assertEqual(response["completion"], "ab")
+
+    def test_failed_streamed_message_is_not_retried(self):
+        self.client._send_message_url = lambda **uuids: self.base_url + "/completion?status=503"
+        with self.assertLogs("claude", "WARNING") as logs:
+            self.assertIsNone(
+                self.client.send_message("org", "conversation", "hi", [], "tz", "model")
+            )
+        self.assertEqual(self._sent(), [("POST", "/completion?status=503")])
+        # The failure is logged with its status, not only as a missing response.
+        self.assertTrue(any("503" in line for line in logs.output))
+
+
+if __name__ == "__main__":
+    unittest.main()
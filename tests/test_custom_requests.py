@@ -0,0 +1,216 @@
+import gzip
+import io
+import os
+import time
+import unittest
+from unittest import mock
+
+from claude import custom_requests
+
+from local_server import RecordingHandler, start_server
+
+
+def _split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class FormDataTest(unittest.TestCase):
+
+    # What the original, urllib based implementation sent for the form in _form_data().
+    EXPECTED_BODY = (
+        b'--B\r\ncontent-disposition: form-data; name="a"\r\n\r\nb\r\n'
+        b'--B\r\ncontent-disposition: form-data; name="x"\r\n\r\ny\r\n'
+        b'--B\r\ncontent-disposition: form-data; name="file"; filename="f.txt"\r\n'
+        b'content-type: text/plain\r\n\r\ndata\r\n'
+        b'--B\r\ncontent-disposition: form-data; name="g"; filename="g.png"\r\n'
+        b'content-type: image/png\r\n\r\nzz\r\n'
+        b'--B--\r\n'
+    )
+
+    def _form_data(self, g_file=None) -> custom_requests.FormData:
+        form_data = custom_requests.FormData({"a": "b"})
+        form_data.add_field("x", "y")
+        form_data.add_file("file", "f.txt", io.BytesIO(b"data"))
+        form_data.add_file("g", "g.png", g_file or io.BytesIO(b"zz"))
+        return form_data
+
+    def setUp(self):
+        patcher = mock.patch.object(custom_requests.FormData, "_generate_boundary", return_value="B")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_encode_matches_the_original_encoding(self):
+        content_type, body = self._form_data().encode()
+        self.assertEqual(content_type, "multipart/form-data; boundary=B")
+        self.assertEqual(body, self.EXPECTED_BODY)
+
+    def test_stream_matches_encode(self):
+        content_type, content_length, chunks = self._form_data().stream(chunk_size=1)
+        self.assertEqual(content_type, "multipart/form-data; boundary=B")
+        self.assertEqual(content_length, len(self.EXPECTED_BODY))
+        self.assertEqual(b"".join(chunks), self.EXPECTED_BODY)
+
+    def test_stream_of_unseekable_file_has_no_content_length(self):
+        read_end, write_end = os.pipe()
+        os.write(write_end, b"zz")
+        os.close(write_end)
+        _, content_length, chunks = self._form_data(g_file=os.fdopen(read_end, "rb")).stream()
+        self.assertIsNone(content_length)
+        self.assertEqual(b"".join(chunks), self.EXPECTED_BODY)
+
+
+class FormDataBoundaryTest(unittest.TestCase):
+
+    def test_boundaries_are_unique(self):
+        form_data = custom_requests.FormData()
+        self.assertNotEqual(form_data._generate_boundary(), form_data._generate_boundary())
+
+
+class GuessContentTypeTest(unittest.TestCase):
+
+    def test_cached_by_extension(self):
+        custom_requests._guess_extension_content_type.cache_clear()
+        self.assertEqual(custom_requests._guess_content_type("a/first.png"), "image/png")
+        self.assertEqual(custom_requests._guess_content_type("b/second.PNG"), "image/png")
+        self.assertEqual(custom_requests._guess_content_type("no_extension"), "application/octet-stream")
+        info = custom_requests._guess_extension_content_type.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 2))
+
+
+class EventDataTest(unittest.TestCase):
+
+    STREAM = (
+        b": keep alive comment\n\n"
+        b'data: {"completion":"a"}\n\n'
+        b"event: completion\n"
+        b'data: {"completion":\n'
+        b'data: "b"}\n\n'
+        b"data: \n\n"
+        b'data:{"completion":"c"}\n\n'
+    )
+    EVENTS = [b'{"completion":"a"}', b'{"completion":\n"b"}', b'{"completion":"c"}']
+
+    def _events(self, chunks):
+        return list(custom_requests._iter_event_data(iter(chunks)))
+
+    def test_events_split_across_chunks(self):
+        for size in range(1, len(self.STREAM) + 1):
+            with self.subTest(chunk_size=size):
+                self.assertEqual(self._events(_split(self.STREAM, size)), self.EVENTS)
+
+    def test_crlf_line_endings(self):
+        stream = self.STREAM.replace(b"\n", b"\r\n")
+        for size in (1, 2, 3, 7, len(stream)):
+            with self.subTest(chunk_size=size):
+                self.assertEqual(self._events(_split(stream, size)), self.EVENTS)
+
+    def test_last_event_without_blank_line(self):
+        self.assertEqual(self._events([b'data: {"a":1}\n\ndata: {"b":2}']), [b'{"a":1}', b'{"b":2}'])
+        self.assertEqual(self._events([b'data: {"a":1}\n\ndata: {"b":2}\r']), [b'{"a":1}', b'{"b":2}'])
+
+    def test_empty_stream(self):
+        self.assertEqual(self._events([]), [])
+
+    def test_gzipped_stream(self):
+        compressed = gzip.compress(self.STREAM)
+        for size in (1, 5, len(compressed)):
+            with self.subTest(chunk_size=size):
+                chunks = custom_requests._iter_gunzipped(iter(_split(compressed, size)))
+                self.assertEqual(self._events(chunks), self.EVENTS)
+
+
+class _Handler(RecordingHandler):
+
+    def respond(self, body):
+        if self.path == "/json":
+            self.send(200, b'{"ok":true}', (("content-type", "application/json"),))
+        elif self.path == "/gzip":
+            self.send(200, gzip.compress(b'{"gzipped":true}'), (("content-encoding", "gzip"),))
+        elif self.path == "/gzip-no-content":
+            self.send(204, headers=(("content-encoding", "gzip"),))
+        elif self.path == "/sse":
+            self.send(200, EventDataTest.STREAM, (("content-type", "text/event-stream"),))
+        elif self.path == "/sse-chunked":
+            self.send_response(200)
+            self.send_header("content-type", "text/event-stream")
+            self.send_header("transfer-encoding", "chunked")
+            self.end_headers()
+            for chunk in _split(EventDataTest.STREAM, 10):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        elif self.path == "/redirect":
+            self.send(302, headers=(("location", "/json"),))
+        elif self.path == "/close":
+            self.send(200, b"{}")
+            self.close_connection = True
+        elif self.path == "/drop":
+            # Got the request, but the connection dies before it's answered.
+            self.close_connection = True
+        else:
+            self.send(404)
+
+
+class SessionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.base_url = start_server(self, _Handler)
+        self.session = custom_requests.Session()
+        self.addCleanup(self.session.close)
+
+    def _pooled(self) -> int:
+        return sum(len(pool) for pool in self.session._pools.values())
+
+    def test_connection_is_reused_after_a_fully_read_response(self):
+        for _ in range(3):
+            response = custom_requests.get(self.base_url + "/json", {}, session=self.session)
+            self.assertTrue(response.ok)
+            self.assertEqual(response.json(), {"ok": True})
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self._pooled(), 1)
+
+    def test_gzipped_response_is_decompressed(self):
+        response = custom_requests.get(self.base_url + "/gzip", {}, session=self.session)
+        self.assertEqual(response.json(), {"gzipped": True})
+
+    def test_empty_gzipped_response(self):
+        response = custom_requests.delete(self.base_url + "/gzip-no-content", {}, session=self.session)
+        self.assertTrue(response.ok)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.data, b"")
+
+    def test_event_streams_go_back_to_the_pool(self):
+        for path in ("/sse", "/sse-chunked"):
+            with self.subTest(path=path):
+                events = list(custom_requests.sse(self.base_url + path, {}, {}, session=self.session))
+                self.assertEqual(events, EventDataTest.EVENTS)
+                self.assertEqual(self._pooled(), 1)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_redirects_are_followed(self):
+        response = custom_requests.get(self.base_url + "/redirect", {}, session=self.session)
+        self.assertEqual(response.json(), {"ok": True})
+        self.assertEqual([request[1] for request in self.server.requests], ["/redirect", "/json"])
+
+    def test_connection_closed_by_the_server_is_not_reused(self):
+        custom_requests.get(self.base_url + "/close", {}, session=self.session)
+        time.sleep(0.1)
+        response = custom_requests.post(self.base_url + "/json", {}, b"{}", session=self.session)
+        self.assertTrue(response.ok)
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_post_is_not_resent_when_the_connection_drops(self):
+        custom_requests.get(self.base_url + "/json", {}, session=self.session)
+        response = custom_requests.post(self.base_url + "/drop", {}, b"{}", session=self.session)
+        self.assertFalse(response.ok)
+        self.assertEqual([request[1] for request in self.server.requests], ["/json", "/drop"])
+
+    def test_get_is_resent_when_the_connection_drops(self):
+        custom_requests.get(self.base_url + "/json", {}, session=self.session)
+        custom_requests.get(self.base_url + "/drop", {}, session=self.session)
+        self.assertEqual(
+            [request[1] for request in self.server.requests], ["/json", "/drop", "/drop"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from claude import helpers
+
+
+class JsonTest(unittest.TestCase):
+
+    def test_dumps_compact_utf8_bytes(self):
+        self.assertEqual(helpers.json_dumps({"a": [1, "é"]}), '{"a":[1,"é"]}'.encode("utf-8"))
+
+    def test_loads_bytes_and_str(self):
+        self.assertEqual(helpers.json_loads(b'{"a":"\\u00e9"}'), {"a": "é"})
+        self.assertEqual(helpers.json_loads('{"a":"é"}'), {"a": "é"})
+
+    def test_loads_invalid_json_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            helpers.json_loads(b"{")
+
+
+class StdlibJsonTest(JsonTest):
+    """Same as JsonTest, with the standard library fallback used when orjson isn't installed."""
+
+    def setUp(self):
+        with mock.patch.dict(sys.modules, {"orjson": None}):
+            importlib.reload(helpers)
+        self.addCleanup(importlib.reload, helpers)
+
+    def test_orjson_is_not_used(self):
+        self.assertEqual(helpers.json_loads.__module__, "json")
+
+
+class IsFileTextBasedTest(unittest.TestCase):
+
+    def _file(self, contents: bytes) -> str:
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as f:
+            f.write(contents)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_text_file_line_endings_are_normalized(self):
+        raw = "a\r\nb\rc é\n".encode("utf-8")
+        self.assertEqual(helpers.is_file_text_based(self._file(raw)), (True, raw, "a\nb\nc é\n"))
+
+    def test_text_with_nul_bytes_is_still_text(self):
+        self.assertEqual(helpers.is_file_text_based(self._file(b"a\x00b")), (True, b"a\x00b", "a\x00b"))
+
+    def test_binary_file_only_reads_the_head(self):
+        raw = b"\xff\xfe" + b"x" * (2 * helpers.TEXT_SNIFF_BYTES)
+        is_text, head, contents = helpers.is_file_text_based(self._file(raw))
+        self.assertFalse(is_text)
+        self.assertEqual(head, raw[:helpers.TEXT_SNIFF_BYTES])
+        self.assertIsNone(contents)
+
+    def test_invalid_utf8_after_the_head_is_binary(self):
+        raw = b"x" * helpers.TEXT_SNIFF_BYTES + b"\xff"
+        self.assertEqual(helpers.is_file_text_based(self._file(raw)), (False, raw, None))
+
+    def test_multi_byte_character_across_the_head_boundary(self):
+        raw = b"x" * (helpers.TEXT_SNIFF_BYTES - 1) + "é".encode("utf-8")
+        self.assertTrue(helpers.is_file_text_based(self._file(raw))[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
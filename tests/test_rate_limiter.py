@@ -0,0 +1,106 @@
+import email.utils
+import threading
+import time
+import unittest
+from unittest import mock
+
+from claude import rate_limiter
+
+
+class ParseRetryAfterTest(unittest.TestCase):
+
+    def test_seconds(self):
+        self.assertEqual(rate_limiter.parse_retry_after("120"), 120.0)
+        self.assertEqual(rate_limiter.parse_retry_after("1.5"), 1.5)
+
+    def test_negative_seconds_mean_now(self):
+        self.assertEqual(rate_limiter.parse_retry_after("-3"), 0.0)
+
+    def test_http_date(self):
+        retry_at = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(rate_limiter.parse_retry_after(retry_at), 30, delta=2)
+
+    def test_http_date_in_the_past_means_now(self):
+        retry_at = email.utils.formatdate(time.time() - 30, usegmt=True)
+        self.assertEqual(rate_limiter.parse_retry_after(retry_at), 0.0)
+
+    def test_missing_or_invalid(self):
+        for value in (None, "", "soon", "Mon, 99 Foo"):
+            with self.subTest(value=value):
+                self.assertIsNone(rate_limiter.parse_retry_after(value))
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        self.sleeps = []
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+        for name, replacement in (("monotonic", lambda: self.now), ("sleep", sleep)):
+            patcher = mock.patch.object(rate_limiter.time, name, side_effect=replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_requests_within_the_limit_go_out_right_away(self):
+        limiter = rate_limiter.RateLimiter(3, 1.0)
+        for _ in range(3):
+            limiter.acquire()
+        self.assertEqual(self.sleeps, [])
+
+    def test_waits_for_the_window_to_pass(self):
+        limiter = rate_limiter.RateLimiter(2, 1.0)
+        for _ in range(3):
+            limiter.acquire()
+        self.assertEqual(self.sleeps, [1.0])
+
+    def test_pause_holds_requests(self):
+        limiter = rate_limiter.RateLimiter(10, 1.0)
+        limiter.pause(5)
+        limiter.acquire()
+        self.assertEqual(self.sleeps, [5])
+
+    def test_slow_down_halves_the_rate_then_recovers(self):
+        limiter = rate_limiter.RateLimiter(4, 1.0)
+        limiter.slow_down()
+        for _ in range(3):
+            limiter.acquire()
+        # Only 2 requests a second after slowing down, and then one more every second.
+        self.assertEqual(self.sleeps, [1.0])
+        self.assertEqual(limiter._limit, 3)
+
+    def test_invalid_limits(self):
+        with self.assertRaises(ValueError):
+            rate_limiter.RateLimiter(0, 1.0)
+        with self.assertRaises(ValueError):
+            rate_limiter.RateLimiter(1, 0)
+
+
+class RateLimiterThreadingTest(unittest.TestCase):
+
+    def test_pause_while_another_thread_waits(self):
+        limiter = rate_limiter.RateLimiter(1, 0.2)
+        limiter.acquire()
+        acquired_at = []
+
+        def acquire():
+            limiter.acquire()
+            acquired_at.append(time.monotonic())
+
+        waiter = threading.Thread(target=acquire)
+        start = time.monotonic()
+        waiter.start()
+        time.sleep(0.05)
+        limiter.pause(0.5)
+        # pause() doesn't have to wait for the sleeping thread.
+        self.assertLess(time.monotonic() - start, 0.15)
+        waiter.join(2)
+        # The waiting thread sees the pause that was set while it slept.
+        self.assertGreaterEqual(acquired_at[0] - start, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()